@@ -12,7 +12,11 @@ import onnx
 import onnxruntime as ort
 import json
 import time
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor
 import requests
+import gzip
 import imutils
 from base64 import b64encode
 from IPython.display import display, HTML
@@ -24,6 +28,13 @@ import pytz
 import wallaroo
 import pandas as pd
 import base64
+from WallarooResolver import get_resolver
+
+try:
+    import zstandard
+except ImportError:
+    # only needed for config['api-compression'] = 'zstd'
+    zstandard = None
 
 
 import tensorflow as tf
@@ -59,6 +70,15 @@ class CVDemo():
     COCO_CLASSES_PATH = "models/coco_classes.pickle"
     
     DASHBOARD_CELL_PADDING = 5.0
+
+    # compression levels for runInferenceOnFrameUsingApi; low levels keep the per frame cost down, the float
+    # tensors compress well even so
+    GZIP_LEVEL = 1
+    ZSTD_LEVEL = 3
+
+    # frames seekToFrame backs off before the target when a seek lands past it, doubled on every retry
+    SEEK_BACKOFF = 32
+
     #def __init__(self, classes, colors, device):
     #    self.CLASSES = classes
     #    self.COLORS = colors
@@ -76,17 +96,15 @@ class CVDemo():
         # Unique colors for each identified COCO class
         self.COLORS = None
 
+        # frameToTensor's reusable input buffers, one per thread
+        self._frameBuffers = threading.local()
+
+        # keep-alive sessions for runInferenceOnFrameUsingApi, one per thread, created on first use
+        self._httpSessions = threading.local()
+
     def setCurrentWorkspace(self, wl, ws_name):
-        found = False
-        ws = wl.list_workspaces()
-        for w in ws:
-            if w.name() == ws_name:
-                wl.set_current_workspace(w)
-                found = True
-                break
-        if not found:
-            workspace = wl.create_workspace(ws_name)
-            wl.set_current_workspace(workspace)
+        workspace = get_resolver(wl).workspace(ws_name, create=True)
+        wl.set_current_workspace(workspace)
 
         
     def getCocoClasses(self):
@@ -158,18 +176,11 @@ class CVDemo():
 
         self.debug("Resizing to w:"+str(width) + " height:"+str(height))
         image = cv2.resize(image, (width, height))
-        resizedImage = image.copy()
+        resizedImage = image
 
-        # convert the image from BGR to RGB channel ordering and change the
-        # image from channels last to channels first ordering
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        image = image.transpose((2, 0, 1))
-
-        # add the batch dimension, scale the raw pixel intensities to the
-        # range [0, 1], and convert the image to a floating point tensor
-        image = np.expand_dims(image, axis=0)
-        image = image / 255.0
-        tensor = torch.FloatTensor(image)
+        # convert to RGB, channels first, float32 in [0, 1] with the batch dimension,
+        # into a tensor of its own
+        tensor = torch.from_numpy(self.frameToTensor(image))
         return tensor, resizedImage
     
    
@@ -215,20 +226,29 @@ class CVDemo():
 
     # converts the pytorch model to onnx by loading the given pytorch model using the sampleImage as the input
     # converting to onnx and saving the onnx model with the name pytorchModelPath + ".onnx"
-    def loadPytorchAndConvertToOnnx(self, pytorchModelPath, sampleImagePath, width, height):
+    #
+    # The Faster R-CNN models are traced one image at a time, so the onnx model takes batch_size frames per run
+    # and has three outputs per frame: boxes_0, classes_0, confidences_0, boxes_1, ...  With batch_size 1 the
+    # outputs keep their names boxes, classes, confidences.  The number of detections in each output is dynamic.
+    def loadPytorchAndConvertToOnnx(self, pytorchModelPath, sampleImagePath, width, height, batch_size=1):
         model = torch.load(pytorchModelPath)
 
         device = 'cpu'
         model = model.to(device)
 
         tensor, resizedImage = self.loadImageAndResize(sampleImagePath, width, height)
+        tensor = tensor.repeat(batch_size, 1, 1, 1)
         input_names = ["data"]
         output_names = ["boxes", "classes","confidences"]
+        if batch_size > 1:
+            output_names = [name+"_"+str(i) for i in range(batch_size) for name in output_names]
+        dynamic_axes = {name: {0: "detections"} for name in output_names}
         torch.onnx.export(model,
                           tensor,
                           pytorchModelPath+'.onnx',
                           input_names=input_names,
                           output_names=output_names,
+                          dynamic_axes=dynamic_axes,
                           opset_version=11,
                           )
 
@@ -502,6 +522,31 @@ class CVDemo():
             
    
     
+    # a (1, 3, height, width) float32 buffer for the frame's tensor, kept per thread and reused for every frame
+    # of the same size.  Only for a tensor that is used up before the thread's next frame, such as one that is
+    # serialized right away: the next frame overwrites it
+    def tensorBuffer(self, frame):
+        shape = (1, 3) + frame.shape[:2]
+        out = getattr(self._frameBuffers, 'tensor', None)
+        if out is None or out.shape != shape:
+            out = np.empty(shape, dtype=np.float32)
+            self._frameBuffers.tensor = out
+        return out
+
+    # converts a BGR frame to the model input in one pass, without torch or a float64 copy: RGB channel order,
+    # channels first, pixel intensities scaled to [0, 1] as float32 and the batch dimension, (1, 3, height, width).
+    # swapRB=False keeps the frame's channel order.  The tensor is written into out if given, such as
+    # tensorBuffer(frame), otherwise into a new array
+    def frameToTensor(self, frame, out=None, swapRB=True):
+        if out is None:
+            out = np.empty((1, 3) + frame.shape[:2], dtype=np.float32)
+
+        channels = frame.transpose((2, 0, 1))
+        if swapRB:
+            channels = channels[::-1]
+        np.divide(channels, np.float32(255.0), out=out[0])
+        return out
+
     # converts the frame to json with key "tensor" with size with and height
     def convertFrameToJsonTensor(self, frame, width, height):
 
@@ -509,19 +554,8 @@ class CVDemo():
         #tensor, resizedImage = self.imageFrameResize(frame, width, height)
         #tensor, resizedImage = self.loadImageAndResize(frame, width, height)
 
-        # convert the image from BGR to RGB channel ordering and change the
-        # image from channels last to channels first ordering
-        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        image = image.transpose((2, 0, 1))
-
-        # add the batch dimension, scale the raw pixel intensities to the
-        # range [0, 1], and convert the image to a floating point tensor
-        image = np.expand_dims(image, axis=0)
-        image = image / 255.0
-        tensor = torch.FloatTensor(image)
-
-        # get npArray from the tensorFloat
-        npArray = tensor.cpu().numpy()
+        # RGB, channels first, float32 in [0, 1], written into the reusable buffer
+        npArray = self.frameToTensor(frame, out=self.tensorBuffer(frame))
         self.debug("frame shape:"+str(npArray.shape))
 
         # handles converting ndarray to lists
@@ -546,19 +580,8 @@ class CVDemo():
         #tensor, resizedImage = self.imageFrameResize(frame, width, height)
         #tensor, resizedImage = self.loadImageAndResize(frame, width, height)
 
-        # convert the image from BGR to RGB channel ordering and change the
-        # image from channels last to channels first ordering
-        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        image = image.transpose((2, 0, 1))
-
-        # add the batch dimension, scale the raw pixel intensities to the
-        # range [0, 1], and convert the image to a floating point tensor
-        image = np.expand_dims(image, axis=0)
-        image = image / 255.0
-        tensor = torch.FloatTensor(image)
-
-        # get npArray from the tensorFloat
-        npArray = tensor.cpu().numpy()
+        # RGB, channels first, float32 in [0, 1], written into the reusable buffer
+        npArray = self.frameToTensor(frame, out=self.tensorBuffer(frame))
         self.debug("frame shape:"+str(npArray.shape))
 
         
@@ -568,17 +591,8 @@ class CVDemo():
         return dictData
     
     def convertFrameToTensorDataframe(self, frame, width, height):
-        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        image = image.transpose((2, 0, 1))
-
-        # add the batch dimension, scale the raw pixel intensities to the
-        # range [0, 1], and convert the image to a floating point tensor
-        image = np.expand_dims(image, axis=0)
-        image = image / 255.0
-        tensor = torch.FloatTensor(image)
-
-        # get npArray from the tensorFloat
-        npArray = tensor.cpu().numpy()
+        # RGB, channels first, float32 in [0, 1], in a new array: the dataframe can outlive the thread's next frame
+        npArray = self.frameToTensor(frame)
         self.debug("frame shape:"+str(npArray.shape))
 
         #creates a dictionary with the wallaroo "tensor" key and the numpy ndim array representing image as the value.
@@ -592,19 +606,8 @@ class CVDemo():
         #tensor, resizedImage = self.imageFrameResize(frame, width, height)
         #tensor, resizedImage = self.loadImageAndResize(frame, width, height)
 
-        # convert the image from BGR to RGB channel ordering and change the
-        # image from channels last to channels first ordering
-        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        image = image.transpose((2, 0, 1))
-
-        # add the batch dimension, scale the raw pixel intensities to the
-        # range [0, 1], and convert the image to a floating point tensor
-        image = np.expand_dims(image, axis=0)
-        image = image / 255.0
-        tensor = torch.FloatTensor(image)
-
-        # get npArray from the tensorFloat
-        npArray = tensor.cpu().numpy()
+        # RGB, channels first, float32 in [0, 1], in a new array the caller can keep
+        npArray = self.frameToTensor(frame)
         self.debug("frame shape:"+str(npArray.shape))
         
         return npArray
@@ -623,20 +626,97 @@ class CVDemo():
         self.debug("infResult")
         self.debug(infResult)
         return infResult
+    # the calling thread's keep-alive session, so its frames reuse a connection to the pipeline instead of opening
+    # a new one each.  requests.Session is not thread safe, so every inference worker gets its own
+    def getHttpSession(self):
+        session = getattr(self._httpSessions, 'session', None)
+        if session is None:
+            session = requests.Session()
+            self._httpSessions.session = session
+        return session
+
+    # the frame as an inference request body and its content type.
+    # apiFormat 'json' is the {"tensor": [...]} json text; 'arrow' is an Arrow IPC file with one row of the float32
+    # tensor in a 'tensor' column, shaped as the pipelines' input schema.  Arrow is about a fifth of the json size
+    # and takes a fraction of the time to encode
+    def encodeFrameForApi(self, frame, width, height, apiFormat):
+        if apiFormat == 'arrow':
+            # only the arrow format needs pyarrow
+            import pyarrow as pa
+            npArray = self.frameToTensor(frame, out=self.tensorBuffer(frame))
+            tensor = pa.array(npArray.reshape(-1))
+            for size in reversed(npArray.shape[1:]):
+                tensor = pa.FixedSizeListArray.from_arrays(tensor, size)
+            table = pa.table({'tensor': tensor})
+            sink = pa.BufferOutputStream()
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            return sink.getvalue().to_pybytes(), 'application/vnd.apache.arrow.file'
+        return self.convertFrameToJsonTensor(frame, width, height).encode(), 'application/json'
+
+    # compresses the request body with compression 'gzip' or 'zstd', or leaves it as it is for None.
+    # Returns the body and the content-encoding header for it
+    def compressApiPayload(self, body, compression):
+        if compression == None:
+            return body, None
+        if compression == 'gzip':
+            return gzip.compress(body, compresslevel=CVDemo.GZIP_LEVEL), 'gzip'
+        if compression == 'zstd':
+            if zstandard is None:
+                raise ValueError("zstd compression needs the zstandard package")
+            return zstandard.ZstdCompressor(level=CVDemo.ZSTD_LEVEL).compress(body), 'zstd'
+        raise ValueError("unknown compression "+str(compression))
+
+    # the pandas-records of an arrow inference response as a dataframe with out.boxes, out.classes, ... columns.
+    # Nested {"out": {"boxes": ...}} records, as the endpoint returns them without dataset.separator, are
+    # flattened the same way
+    def apiRecordsToDataframe(self, records):
+        return pd.json_normalize(records, max_level=1)
+
     #
+    # Runs inference on the frame by posting it to the pipeline's url.
+    # config['api-format'] is 'json' (the default) or 'arrow', and config['api-compression'] None (the default),
+    # 'gzip' or 'zstd'; the pipeline must accept the content-encoding.  The result has the bytes sent on the wire
+    # and before compression, the bytes received, and the encode and request seconds
     #
-    #
-    def runInferenceOnFrameUsingApi(self, frame, pipelineEndPointUrl, width, height):
-        jsonInput = self.convertFrameToJsonTensor(frame, width, height)
-        # Run inference by calling the wallaroo url rest api endpoint feeding it the jsonInput
+    def runInferenceOnFrameUsingApi(self, frame, pipelineEndPointUrl, width, height, config=None):
+        apiFormat = 'json'
+        compression = None
+        if config != None:
+            if 'api-format' in config:
+                apiFormat = config['api-format']
+            if 'api-compression' in config:
+                compression = config['api-compression']
+
+        encodeStartTime = time.time()
+        body, contentType = self.encodeFrameForApi(frame, width, height, apiFormat)
+        payloadBytes = len(body)
+        body, contentEncoding = self.compressApiPayload(body, compression)
+        encodeTime = time.time() - encodeStartTime
+
+        # Run inference by calling the wallaroo url rest api endpoint feeding it the encoded frame
         jsonOutput = ""
         try:
-            self.debug("Running wallaroo pipeline inference using image represented as json")
+            self.debug("Running wallaroo pipeline inference using image represented as "+apiFormat)
             self.debug("Url Endpoint:"+pipelineEndPointUrl)
-            headers = {'Content-type': 'application/json', 'content-encoding':'gzip', 'Accept': 'text/plain'}
+            headers = {'Content-Type': contentType, 'Accept': 'application/json'}
+            params = None
+            if apiFormat == 'arrow':
+                headers['Accept'] = 'application/json; format=pandas-records'
+                # flat out.boxes, out.classes, ... columns rather than an out dictionary
+                params = {'dataset.separator': '.'}
+            if contentEncoding != None:
+                headers['Content-Encoding'] = contentEncoding
             startTime = time.time()
-            response = requests.post(pipelineEndPointUrl, data=jsonInput, headers=headers)
-            self.print("status_code="+str(response.status_code))
+            response = self.getHttpSession().post(pipelineEndPointUrl, data=body, headers=headers, params=params)
+            requestTime = time.time() - startTime
+            bytesReceived = int(response.headers.get('Content-Length', len(response.content)))
+            self.print("status_code="+str(response.status_code) +
+                       " sent: {:.1f}KB".format(len(body) / 1024) +
+                       " ({} {:.1f}KB)".format(apiFormat, payloadBytes / 1024) +
+                       " received: {:.1f}KB".format(bytesReceived / 1024) +
+                       " encode: {:.4f}".format(encodeTime) +
+                       " request: {:.4f}".format(requestTime))
             jsonOutput = response.json()
             if (response.status_code != 200):
                 self.print("printing response's jsonOutput")
@@ -647,26 +727,34 @@ class CVDemo():
                  self.print("json response not a list")
                  self.print(jsonOutput)
                  return None
-                
-            outputs = jsonOutput[0]['outputs']
-            if outputs is None:
-                self.print("Could not extract inference results from jsonOutput")
-                self.print(jsonOutput)
+
+            if apiFormat == 'arrow':
+                infResult = self.convertWallarooResultToInferenceResultDataframe(self.apiRecordsToDataframe(jsonOutput))
+            else:
+                outputs = jsonOutput[0]['outputs']
+                if outputs is None:
+                    self.print("Could not extract inference results from jsonOutput")
+                    self.print(jsonOutput)
             
-            # get rid of orginal_data
-            jsonOutput[0].pop('original_data', None)
-
-            #if 'outputs' not in jsonOutput[0]:
-            #    self.print(jsonOutput)
-            #    jsonOutput = None
-            #with open("sample-output.json", "w") as outfile:
-            #    outfile.write(jsonOutput)
-            #jsonOutput[0].pop('original_data', None)
+                # get rid of orginal_data
+                jsonOutput[0].pop('original_data', None)
+
+                #if 'outputs' not in jsonOutput[0]:
+                #    self.print(jsonOutput)
+                #    jsonOutput = None
+                #with open("sample-output.json", "w") as outfile:
+                #    outfile.write(jsonOutput)
+                #jsonOutput[0].pop('original_data', None)
             
-            endTime = time.time()
-            jsonOutput[0]['inference-time'] = (endTime - startTime)
+                jsonOutput[0]['inference-time'] = requestTime
             
-            infResult = self.convertWallarooJsonToInferenceResultDict(jsonOutput)
+                infResult = self.convertWallarooJsonToInferenceResultDict(jsonOutput)
+
+            infResult['inference-time'] = requestTime
+            infResult['encode-time'] = encodeTime
+            infResult['payload-bytes'] = payloadBytes
+            infResult['bytes-sent'] = len(body)
+            infResult['bytes-received'] = bytesReceived
 
         except Exception as e:
             self.print("An Exception occurred:")
@@ -677,13 +765,39 @@ class CVDemo():
             infResult = None
         return infResult
     
+    # the number of frames an onnx session takes per run, or None if its batch dimension is dynamic
+    def onnxBatchSize(self, onnx_session):
+        batch_size = onnx_session.get_inputs()[0].shape[0]
+        return batch_size if isinstance(batch_size, int) else None
+
+    # splits the outputs of one onnx run over batch_size frames into boxes, classes, confidences per frame,
+    # each without a batch dimension, e.g. boxes (detections, 4), as loadPytorchAndConvertToOnnx's export
+    # returns them for one frame.  A model exported by loadPytorchAndConvertToOnnx has three outputs per frame;
+    # batched is for a model with a dynamic batch dimension, whose three outputs are batched along their first
+    # axis even for a batch of one
+    def splitOnnxOutputsPerFrame(self, onnx_output, batch_size, batched=False):
+        if not batched and len(onnx_output) == 3 * batch_size:
+            return [onnx_output[3 * i:3 * i + 3] for i in range(batch_size)]
+        return [[output[i] for output in onnx_output[:3]] for i in range(batch_size)]
+
+    # runs the onnx model on one frame, or on a list of frames as few runs as the model's batch size allows.
+    # Returns an inference result for the frame, or a list with one per frame.  The onnx-time of each result
+    # is its share of the time of the run it was in.
     def inferUsingOnnx(self, image, config):
         # load the image we want to categorize using the onnx model
         #tensor, resizedImage = self.loadImageAndResize(imagePath,width,height)
-        infResult = {}
+        frames = image if isinstance(image, (list, tuple)) else [image]
 
-        tensor = self.convertFrameToTensor(image)
-        self.saveInputToFile("onnx-input.json",tensor)
+        if len(frames) == 1:
+            # the session is done with the tensor before this thread converts another frame
+            tensor = self.frameToTensor(frames[0], out=self.tensorBuffer(frames[0]))
+        else:
+            # the frames are converted straight into one batch
+            tensor = np.empty((len(frames), 3) + frames[0].shape[:2], dtype=np.float32)
+            for i, frame in enumerate(frames):
+                self.frameToTensor(frame, out=tensor[i:i + 1])
+        if self.DEBUG == True:
+            self.saveInputToFile("onnx-input.json",tensor)
         self.debug(config)
         
         
@@ -693,29 +807,38 @@ class CVDemo():
 
         self.debug("Onnx Input Shape")
         self.debug(tensor.shape)
-        
-        #TODO we only need to do this once.  Fix this
-        #onnx_session= ort.InferenceSession(config['onnx_model_path'])
-        #model = onnx.load(config['onnx_model_path'])
-        #onnx.checker.check_model(model)
 
-        startTime = time.time()
         onnx_session = config['onnx-session']
-        onnx_inputs= {onnx_session.get_inputs()[0].name: tensor}
-        onnx_output = onnx_session.run(None, onnx_inputs)
-        endTime = time.time()
-        infResult['onnx-time'] = (endTime - startTime)
+        input_name = onnx_session.get_inputs()[0].name
+        model_batch_size = self.onnxBatchSize(onnx_session)
+        batch_size = model_batch_size or len(frames)
+
+        infResults = []
+        for start in range(0, len(frames), batch_size):
+            batch = tensor[start:start + batch_size]
+            n = len(batch)
+            # a model exported for a fixed batch needs a full one, so the last batch is padded
+            # with copies of its last frame and their outputs dropped
+            if n < batch_size:
+                batch = np.concatenate([batch, np.repeat(batch[-1:], batch_size - n, axis=0)])
 
-        self.debug("Onnx Inference Result")
-        self.debug(onnx_output)
-        
-        out_y = onnx_output[0]
+            startTime = time.time()
+            onnx_output = onnx_session.run(None, {input_name: batch})
+            endTime = time.time()
 
-        infResult['boxes'] = onnx_output[0]
-        infResult['classes'] = onnx_output[1]
-        infResult['confidences'] = onnx_output[2]
-        
-        return infResult
+            self.debug("Onnx Inference Result")
+            self.debug(onnx_output)
+
+            perFrame = self.splitOnnxOutputsPerFrame(onnx_output, batch_size, batched=model_batch_size is None)
+            for boxes, classes, confidences in perFrame[:n]:
+                infResult = {}
+                infResult['onnx-time'] = (endTime - startTime) / n
+                infResult['boxes'] = boxes
+                infResult['classes'] = classes
+                infResult['confidences'] = confidences
+                infResults.append(infResult)
+
+        return infResults if isinstance(image, (list, tuple)) else infResults[0]
      
     def extractAnomaliesFromInference(self,infResultDict, walInfResult):
         results = walInfResult[0].raw
@@ -867,7 +990,6 @@ class CVDemo():
     #
     def runInferenceOnFrame(self, frame, config):
         
-        dictTensor = self.convertFrameToTensorDict(frame, config['width'], config['height'])
         # Run inference by calling the wallaroo url rest api endpoint feeding it the jsonInput
         inferResult = None
         json = None
@@ -877,13 +999,8 @@ class CVDemo():
         #jsonData = json.dumps(dictTensor)
         #with open("dictTensor.json", "w") as outfile:
         #    outfile.write(jsonData)
-        if ('skip-frames-list' in config):
-            for tplRange in config['skip-frames-list']:
-                if (config['frame-cnt'] >= tplRange[0] and
-                   config['frame-cnt'] <= tplRange[1]):
-                          self.print("Frame in skip range. [" + str(config['frame-cnt']) + "]  skipping")
-                          return None
-            
+        if self.frameInSkipRange(config):
+            return None
 
         if (config['inference'] == "ONNX"):
             infResult = self.inferUsingOnnx(frame,config)
@@ -891,7 +1008,7 @@ class CVDemo():
             #pipeline = config['pipeline']
             #inferResult = pipeline.infer(dictTensor)
             #self.print(inferResult[0].data())
-            infResult = self.runInferenceOnFrameUsingApi(frame, config['endpoint-url'],  config['width'], config['height'])
+            infResult = self.runInferenceOnFrameUsingApi(frame, config['endpoint-url'],  config['width'], config['height'], config)
         elif (config['inference'] == "WALLAROO_SDK"):
              infResult = self.runInferenceOnFrameUsingSdk(frame, config)
         endTime = time.time()
@@ -903,6 +1020,41 @@ class CVDemo():
         #    print(e)
         #    infResult = None
         return infResult
+
+    # whether config['frame-cnt'] is in one of the config['skip-frames-list'] ranges
+    def frameInSkipRange(self, config):
+        if ('skip-frames-list' in config):
+            for tplRange in config['skip-frames-list']:
+                if (config['frame-cnt'] >= tplRange[0] and
+                   config['frame-cnt'] <= tplRange[1]):
+                          self.print("Frame in skip range. [" + str(config['frame-cnt']) + "]  skipping")
+                          return True
+        return False
+
+    #
+    # runs inference on a list of frames, each with its own config, and returns a list with a result per frame,
+    # None for a frame in a skip range.  With config['inference'] = 'ONNX' the frames go through inferUsingOnnx
+    # together, as few onnx runs as the model's batch size allows, and each frame's inference-time is its share
+    # of the time; the wallaroo pipelines are called a frame at a time
+    #
+    def runInferenceOnFrames(self, frames, configs):
+        infResults = [None] * len(frames)
+        if configs[0]['inference'] != "ONNX":
+            for i, frame in enumerate(frames):
+                infResults[i] = self.runInferenceOnFrame(frame, configs[i])
+            return infResults
+
+        inferIndexes = [i for i, config in enumerate(configs) if not self.frameInSkipRange(config)]
+        if len(inferIndexes) == 0:
+            return infResults
+        startTime = time.time()
+        batchResults = self.inferUsingOnnx([frames[i] for i in inferIndexes], configs[inferIndexes[0]])
+        inferenceTime = (time.time() - startTime) / len(inferIndexes)
+        for i, infResult in zip(inferIndexes, batchResults):
+            infResult['pipeline_name'] = configs[i]['pipeline_name']
+            infResult['inference-time'] = inferenceTime
+            infResults[i] = infResult
+        return infResults
         
   
         
@@ -1429,13 +1581,48 @@ class CVDemo():
             
         return image
     
+    # The number of frames in the video from its container metadata, or by grabbing every frame when the
+    # container does not record it
+    def countFrames(self, videoPath):
+        cap = cv2.VideoCapture(videoPath)
+        frameCnt = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if frameCnt <= 0:
+            frameCnt = self.count_frames_manual(cap)
+        cap.release()
+        return frameCnt
+
+    # Moves a newly opened cap to frame number frameCnt, counting from 1, without decoding the frames before it.
+    # A seek only decodes from the nearest key frame; videos that cannot seek are moved with grab(), which skips
+    # converting each frame to an image.  Many backends report success for a seek that lands near the target,
+    # on a key frame, so the position is read back: a seek short of the target is finished with grab(), and one
+    # past it is retried SEEK_BACKOFF frames earlier, then twice as far back each time, until it lands at or
+    # before the target.  Returns the number of the frame the next read returns
+    def seekToFrame(self, cap, frameCnt):
+        skipCnt = frameCnt - 1
+        if skipCnt <= 0:
+            return 1
+        position = 0
+        if cap.set(cv2.CAP_PROP_POS_FRAMES, skipCnt):
+            position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+            backoff = CVDemo.SEEK_BACKOFF
+            while position > skipCnt:
+                seekTo = max(skipCnt - backoff, 0)
+                cap.set(cv2.CAP_PROP_POS_FRAMES, seekTo)
+                position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+                if seekTo == 0:
+                    break
+                backoff *= 2
+        while position < skipCnt and cap.grab():
+            position += 1
+        return position + 1
+
     def count_frames_manual(self,video):
         # initialize the total number of frames read
         total = 0
         # loop over the frames of the video
         while True:
-            # grab the current frame
-            (grabbed, frame) = video.read()
+            # grab the current frame without decoding it into an image
+            grabbed = video.grab()
 
             # check to see if we have reached the end of the
             # video
@@ -1451,6 +1638,14 @@ class CVDemo():
     # Runs inference
     # Draws inference results on a copy of the frame
     # Writes frame out to video in outVideoPath
+    #
+    # The stages run at the same time: a decode thread reads and resizes the frames, a pool of
+    # config['inference-workers'] threads runs inference on them, and this thread draws and writes them in
+    # their original order.  At most config['queue-size'] frames wait between decoding and drawing.
+    # Each inference call takes config['inference-batch-size'] frames, by default the batch size of a fixed
+    # batch onnx model, otherwise 1, so a model exported for a batch of frames runs full batches.
+    # Every config['stats-interval'] frames, and at the end, each stage's throughput and the queue depth
+    # are printed; the final numbers are left in config['video-stats']
     def detectAndClassifyObjectsInVideo(self, config):
         running = True
         newYorkTz = pytz.timezone("America/New_York")
@@ -1465,8 +1660,6 @@ class CVDemo():
         height = config['height']
         pipelineEndPointUrl = config['endpoint-url']
 
-        maxFrameCnt = 0
-        maxSkipCnt = 0
         maxFrameCnt = 0
         if 'max-frames' in config:
             maxFrameCnt = config['max-frames']
@@ -1486,6 +1679,22 @@ class CVDemo():
             model = onnx.load(config['onnx_model_path'])
             onnx.checker.check_model(model)
             config['onnx-session'] = onnx_session
+
+        # onnxruntime already uses every core for one frame, the wallaroo pipelines are waited on over the network
+        inferenceWorkers = 1 if config['inference'] == 'ONNX' else 4
+        if 'inference-workers' in config:
+            inferenceWorkers = config['inference-workers']
+        inferenceBatchSize = 1
+        if config['inference'] == 'ONNX':
+            inferenceBatchSize = self.onnxBatchSize(config['onnx-session']) or 1
+        if 'inference-batch-size' in config:
+            inferenceBatchSize = config['inference-batch-size']
+        queueSize = 2 * inferenceWorkers * inferenceBatchSize
+        if 'queue-size' in config:
+            queueSize = config['queue-size']
+        statsInterval = 100
+        if 'stats-interval' in config:
+            statsInterval = config['stats-interval']
             
         cap = cv2.VideoCapture(inVideoPath)
         self.print("Video Properties")
@@ -1500,9 +1709,11 @@ class CVDemo():
         self.print("   width:"+str(cap.get(cv2.CAP_PROP_FRAME_WIDTH)))
         self.print("   height:"+str(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
         self.print("   fps:"+str(cap.get(cv2.CAP_PROP_FPS)))
-        #self.print("   frame count:"+str(self.count_frames_manual(cv2.VideoCapture(inVideoPath))))
+        self.print("   frame count:"+str(self.countFrames(inVideoPath)))
+        self.print("   inference workers:"+str(inferenceWorkers))
+        self.print("   inference batch size:"+str(inferenceBatchSize))
+        self.print("   queue size:"+str(queueSize))
    
-        frameStats = "Frame"
         rowHeight = 25
         rows = 6
         #statsHeight = statsRowHeight*rows
@@ -1539,107 +1750,237 @@ class CVDemo():
         self.print("recordStartFrame:"+str(recordStartFrame))
         self.print("recordEndFrame:"+str(recordEndFrame))
 
-        frameCnt = 1
-        config['frame-cnt']=frameCnt
-        skipCnt = 0
+        config['frame-cnt']=1
         row = 1
+        stats = self.newVideoStats(inferenceWorkers)
+        frames = queue.Queue(maxsize=queueSize)
+        stop = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=inferenceWorkers, thread_name_prefix="inference")
+        decoder = threading.Thread(target=self.decodeVideoFrames, name="decode",
+                                   args=(cap, frames, executor, config, stats, stop, inferenceBatchSize))
+        decoder.start()
         try:
-            while cap.isOpened():
-                totalStartTime = startTime = time.time()
-                ret, frame = cap.read()
-                endTime = time.time()
-                skipCnt += 1
-                if (skipCnt < maxSkipCnt):
-                    #self.debug("skipping frame:"+str(frameCnt))
-                    frameCnt += 1
-                    continue
-                if (ret == True):
-                    frameStats += ":"+str(frameCnt) +" Read: {:.4f}".format(endTime-startTime)
-                   
-                    # resize frame for width and height the objecet detector is expecting
-                    frame = cv2.resize(frame, (width, height))
+            while True:
+                # the frames still queued behind this one
+                item = frames.get()
+                self.addQueueDepth(stats, frames.qsize())
+                if item == None:
+                    break
+                frameCnt, frame, future, batchIndex, readTime = item
+                config['frame-cnt']=frameCnt
 
-                    # run inference on the frame using width and height object detector is expecting
-                    try:
-                        infResult = self.runInferenceOnFrame(frame, config)
-                    except Exception as e:
-                        self.print(e)
-                        self.print("could not read frame")
-                        self.print("exiting at frame:"+str(frameCnt))
-                        raise e
-                        break
-                        
-                    if (infResult == None):
-                        self.print("Could not inference frame:"+str(frameCnt))
-                        self.print("Pressing on.  Try reading next frame")
-                        frameCnt += 1
-                        config['frame-cnt']=frameCnt
-                        continue
+                # run inference on the frame using width and height object detector is expecting
+                try:
+                    infResult = future.result()[batchIndex]
+                except Exception as e:
+                    self.print(e)
+                    self.print("could not read frame")
+                    self.print("exiting at frame:"+str(frameCnt))
+                    raise e
+
+                if (infResult == None):
+                    self.print("Could not inference frame:"+str(frameCnt))
+                    self.print("Pressing on.  Try reading next frame")
+                    continue
                     
-                    #infConfig = self.buildConfigFromPipelineInfernece(json)
-                    infResult['image'] = frame
-                    infResult['model_name'] = config['model_name']
-                    infResult['pipeline_name'] = config['pipeline_name']
+                #infConfig = self.buildConfigFromPipelineInfernece(json)
+                infResult['image'] = frame
+                infResult['model_name'] = config['model_name']
+                infResult['pipeline_name'] = config['pipeline_name']
 
-                    infResult['confidence-target'] = config['confidence-target']
-                    infResult['color'] = config['color']
-                    
-                    frameStats += " Inf: {:.4f}".format(infResult['inference-time'])
-                    
-                    #This formula is elapsed wallaroo time
-                    #onnxTime =  int(infResult['onnx-time']) / 1e+6
-                    frameStats += " Onnx: {:.4f}".format(infResult['onnx-time'])
-                                        
-                    # Drawing the inference results and stats
-                    startTime = time.time()
-                    detObjFrame = self.drawDetectedObjectsWithClassification(infResult)
-                    
-                    self.addInferenceResultsToDashboard(infResult, columns, row+3, dashboardFrame)
-                    self.addNotesToDashboard(dashboardFrame, frameCnt, config)
-                    image = cv2.vconcat([dashboardFrame,detObjFrame])
-                    
-                    if recordStartFrame > 0:
-                        if frameCnt > recordStartFrame:
-                            if frameCnt < recordEndFrame:
-                                self.debug("recording image:"+str(frameCnt))
-                                output.write(image)
-                            else:
-                                break #exit
+                infResult['confidence-target'] = config['confidence-target']
+                infResult['color'] = config['color']
+                
+                # Drawing the inference results and stats
+                startTime = time.time()
+                detObjFrame = self.drawDetectedObjectsWithClassification(infResult)
+                
+                self.addInferenceResultsToDashboard(infResult, columns, row+3, dashboardFrame)
+                self.addNotesToDashboard(dashboardFrame, frameCnt, config)
+                image = cv2.vconcat([dashboardFrame,detObjFrame])
+                
+                if recordStartFrame > 0:
+                    if frameCnt > recordStartFrame:
+                        if frameCnt < recordEndFrame:
+                            self.debug("recording image:"+str(frameCnt))
+                            output.write(image)
                         else:
-                            self.debug("skipping frame:"+str(frameCnt))
+                            break #exit
                     else:
-                        self.debug("writing image:"+str(frameCnt))
-                        output.write(image)
-                        
-                    endTime = time.time()
-                    frameStats += " Draw: {:.4f}".format(endTime-startTime)
-                    frameStats += " Total: {:.4f}".format(endTime-totalStartTime)
-
-                    self.print(frameStats)
-                    frameStats = "Frame"
+                        self.debug("skipping frame:"+str(frameCnt))
                 else:
-                    self.print("frame reading error:"+str(frameCnt))
-
-                # option to exit early
-                if (maxFrameCnt > 0 and frameCnt > maxFrameCnt):
-                    self.print("Exiting early frameCnt > maxFrameCnt")
-                    break
+                    self.debug("writing image:"+str(frameCnt))
+                    output.write(image)
                     
-                frameCnt += 1
-                config['frame-cnt']=frameCnt
+                endTime = time.time()
+                self.addStageTime(stats, 'draw', endTime-startTime)
+
+                #This formula is elapsed wallaroo time
+                #onnxTime =  int(infResult['onnx-time']) / 1e+6
+                frameStats = "Frame:"+str(frameCnt) +" Read: {:.4f}".format(readTime)
+                frameStats += " Inf: {:.4f}".format(infResult['inference-time'])
+                frameStats += " Onnx: {:.4f}".format(infResult['onnx-time'])
+                frameStats += " Draw: {:.4f}".format(endTime-startTime)
+                if 'bytes-sent' in infResult:
+                    frameStats += " Sent: {:.1f}KB".format(infResult['bytes-sent'] / 1024)
+                frameStats += " Queue: "+str(frames.qsize())
+                self.debug(frameStats)
+
+                if statsInterval > 0 and stats['draw'][0] % statsInterval == 0:
+                    self.print(self.formatVideoStats(stats))
 
         except KeyboardInterrupt:
             running = False
             self.print("Exiting")
-            
-        cap.release()
-        output.release()
+        finally:
+            # stop decoding and drop the frames that will not be drawn.  The decoder is joined first, so it never
+            # submits to the pool after the pool is shut down
+            stop.set()
+            decoder.join()
+            executor.shutdown(wait=True, cancel_futures=True)
+            cap.release()
+            output.release()
+
+        self.print(self.formatVideoStats(stats))
+        config['video-stats'] = self.videoStatsSummary(stats)
         self.print("Finished writing video:"+outVideoPath)
 
         localTime = datetime.now(newYorkTz)
         localTime = localTime.strftime("%H:%M:%S")
         self.print("End Time:"+localTime)
         return running
+
+    # The decode stage of detectAndClassifyObjectsInVideo.  Reads the frames from config['skip-frames'], or
+    # after config['record-start-frame'], resizes them for the model, hands them to the inference pool
+    # batchSize at a time and queues (frameCnt, frame, future, batchIndex, readTime) in frame order, where
+    # future's result is the list of the batch's inference results.  Queues None once the video ends or
+    # config['max-frames'] is passed, and gives up when stop is set
+    def decodeVideoFrames(self, cap, frames, executor, config, stats, stop, batchSize=1):
+        maxFrameCnt = 0
+        if 'max-frames' in config:
+            maxFrameCnt = config['max-frames']
+        maxSkipCnt = 0
+        if 'skip-frames' in config:
+            maxSkipCnt = config['skip-frames']
+
+        recordStartFrame = 0
+        if 'record-start-frame' in config:
+            recordStartFrame = config['record-start-frame']
+
+        # frames before skip-frames, and up to record-start-frame, are never drawn, so they are seeked past
+        frameCnt = self.seekToFrame(cap, max(maxSkipCnt, recordStartFrame + 1))
+        # the frames read but not yet handed to the pool, as (frameCnt, frame, frameConfig, readTime)
+        batch = []
+        try:
+            while cap.isOpened() and not stop.is_set():
+                startTime = time.time()
+                ret, frame = cap.read()
+                if (ret != True):
+                    self.print("No more frames to read after frame:"+str(frameCnt-1))
+                    break
+
+                # resize frame for width and height the objecet detector is expecting
+                frame = cv2.resize(frame, (config['width'], config['height']))
+                readTime = time.time() - startTime
+                self.addStageTime(stats, 'read', readTime)
+
+                # the workers share config, so each frame gets a copy with its own frame-cnt
+                frameConfig = dict(config)
+                frameConfig['frame-cnt'] = frameCnt
+                batch.append((frameCnt, frame, frameConfig, readTime))
+                if len(batch) == batchSize:
+                    if not self.submitFrameBatch(executor, frames, batch, stats, stop):
+                        return
+                    batch = []
+
+                # option to exit early
+                if (maxFrameCnt > 0 and frameCnt > maxFrameCnt):
+                    self.print("Exiting early frameCnt > maxFrameCnt")
+                    break
+                frameCnt += 1
+
+            # the last, partial batch
+            if len(batch) > 0 and not stop.is_set():
+                self.submitFrameBatch(executor, frames, batch, stats, stop)
+        finally:
+            self.putUnlessStopped(frames, None, stop)
+
+    # hands a batch of (frameCnt, frame, frameConfig, readTime) to the inference pool as one call and queues
+    # each of its frames.  Returns whether they were all queued before stop was set
+    def submitFrameBatch(self, executor, frames, batch, stats, stop):
+        future = executor.submit(self.runInferenceOnFramesInStage,
+                                 [frame for _, frame, _, _ in batch], [frameConfig for _, _, frameConfig, _ in batch],
+                                 stats)
+        for batchIndex, (frameCnt, frame, frameConfig, readTime) in enumerate(batch):
+            if not self.putUnlessStopped(frames, (frameCnt, frame, future, batchIndex, readTime), stop):
+                return False
+        return True
+
+    # The inference stage of detectAndClassifyObjectsInVideo, run by each worker of the pool on a batch of frames
+    def runInferenceOnFramesInStage(self, frames, configs, stats):
+        startTime = time.time()
+        infResults = self.runInferenceOnFrames(frames, configs)
+        self.addStageTime(stats, 'inference', time.time() - startTime, len(frames))
+        return infResults
+
+    # puts item on the bounded queue, waiting for room unless stop is set.  Returns whether it was put
+    def putUnlessStopped(self, frameQueue, item, stop):
+        while not stop.is_set():
+            try:
+                frameQueue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    # per stage [frames, busy seconds, threads] and the queue depth seen by the draw stage [total, max, samples]
+    def newVideoStats(self, inferenceWorkers):
+        return {
+            'lock': threading.Lock(),
+            'start-time': time.time(),
+            'read': [0, 0.0, 1],
+            'inference': [0, 0.0, inferenceWorkers],
+            'draw': [0, 0.0, 1],
+            'queue-depth': [0, 0, 0],
+        }
+
+    def addStageTime(self, stats, stage, seconds, frameCnt=1):
+        with stats['lock']:
+            stats[stage][0] += frameCnt
+            stats[stage][1] += seconds
+
+    def addQueueDepth(self, stats, depth):
+        with stats['lock']:
+            queueDepth = stats['queue-depth']
+            queueDepth[0] += depth
+            queueDepth[1] = max(queueDepth[1], depth)
+            queueDepth[2] += 1
+
+    # The frames per second each stage could sustain on its own, the frames per second drawn so far,
+    # and the average and largest queue depth.  The slowest stage sets the pace of the whole video
+    def videoStatsSummary(self, stats):
+        with stats['lock']:
+            summary = {}
+            for stage in ['read', 'inference', 'draw']:
+                frameCnt, seconds, threads = stats[stage]
+                summary[stage+'-fps'] = frameCnt * threads / seconds if seconds > 0 else 0.0
+            elapsed = time.time() - stats['start-time']
+            summary['frames'] = stats['draw'][0]
+            summary['fps'] = stats['draw'][0] / elapsed if elapsed > 0 else 0.0
+            total, largest, samples = stats['queue-depth']
+            summary['avg-queue-depth'] = total / samples if samples > 0 else 0.0
+            summary['max-queue-depth'] = largest
+        return summary
+
+    def formatVideoStats(self, stats):
+        summary = self.videoStatsSummary(stats)
+        msg = "Frames: "+str(summary['frames']) + " FPS: {:.2f}".format(summary['fps'])
+        msg += " Stage FPS Read: {:.2f}".format(summary['read-fps'])
+        msg += " Inf: {:.2f}".format(summary['inference-fps'])
+        msg += " Draw: {:.2f}".format(summary['draw-fps'])
+        msg += " Queue avg: {:.1f}".format(summary['avg-queue-depth'])
+        msg += " max: "+str(summary['max-queue-depth'])
+        return msg
     
     # Reads through each frame in the inVideo,
     # Resizes te frame for the mdoel
@@ -1711,8 +2052,6 @@ class CVDemo():
         modelColors = np.random.uniform(0, 255, size=(len(challengerModelList)+1, 3))
         modelColors = [ CVDemo.CYAN, CVDemo.ORANGE ]
 
-        frameCnt = 1
-        skipCnt = 0
         self.addTitleToDashboard( "Wallaroo Computer Vision Statistics Dashboard", config, dashboardFrame)
         columns = [
             '    Model   ',
@@ -1728,8 +2067,8 @@ class CVDemo():
         self.addColumnTitlesToToDashboard(columns, dashboardFrame)
         wins = [0] * (len(challengerModelList) + 1) # for control
         
-        frameCnt = 1
-        skipCnt = 0
+        # seek past the skipped frames instead of decoding them
+        frameCnt = self.seekToFrame(cap, maxSkipCnt)
         config['frame-cnt'] = frameCnt
         try:
             while cap.isOpened():
@@ -1737,12 +2076,6 @@ class CVDemo():
                 ret, frame = cap.read()
                 endTime = time.time()
 
-                skipCnt += 1
-                if (skipCnt < maxSkipCnt):
-                    #self.debug("skipping frame:"+str(frameCnt))
-                    frameCnt += 1
-                    config['frame-cnt']=frameCnt
-                    continue
                 if (ret == True):
                     frameStats += ":" + str(frameCnt) + " Read: {:.4f}".format(endTime - startTime)
 
@@ -1897,8 +2230,9 @@ class CVDemo():
         modelColors = np.random.uniform(0, 255, size=(len(challengerModelList)+1, 3))
         modelColors = [ CVDemo.CYAN, CVDemo.ORANGE ]
 
-        frameCnt = 1
-        skipCnt = 0
+        # seek past the skipped frames instead of decoding them
+        frameCnt = self.seekToFrame(cap, maxSkipCnt)
+        config['frame-cnt'] = frameCnt
         self.addTitleToDashboard( "Wallaroo Computer Vision Statistics Dashboard", config, dashboardFrame)
         columns = [
             '    Model   ',
@@ -1919,12 +2253,6 @@ class CVDemo():
                 ret, frame = cap.read()
                 endTime = time.time()
                 
-                skipCnt += 1
-                if (skipCnt < maxSkipCnt):
-                    #self.debug("skipping frame:"+str(frameCnt))
-                    frameCnt += 1
-                    config['frame-cnt']=frameCnt
-                    continue
                 if (ret == True):
                     frameStats += ":" + str(frameCnt) + " Read: {:.4f}".format(endTime - startTime)
 
@@ -2082,8 +2410,8 @@ class CVDemo():
         output = cv2.VideoWriter(outVideoPath, cv2.VideoWriter_fourcc(*'mp4v'), fps, frameSize)
         #output = cv2.VideoWriter(outVideoPath, cv2.VideoWriter_fourcc(*'XVID'), fps, frame_size)
         
-        frameCnt = 1
-        skipCnt = 0
+        # seek past the skipped frames instead of decoding them
+        frameCnt = self.seekToFrame(cap, maxSkipCnt)
              
         try:
             while cap.isOpened():
@@ -2091,12 +2419,7 @@ class CVDemo():
                 ret, frame = cap.read()
                 endTime = time.time()
                 frameCnt += 1
-                frame = cv2.resize(frame, (width, height))
                 
-                skipCnt += 1
-                if (skipCnt < maxSkipCnt):
-                    #self.print("skipping frame:"+str(frameCnt))
-                    continue
                 if (ret == True):
                     frameStats += ":"+str(frameCnt) +" Read: {:.4f}".format(endTime-startTime)
                    
@@ -2223,19 +2546,14 @@ class CVDemo():
         # initialize the video writer with the frame size that accounts for the dashboard.
         output = cv2.VideoWriter(outVideoPath, cv2.VideoWriter_fourcc(*'mp4v'), fps, frameSize)
 
-        frameCnt = 1
-        skipCnt = 0
+        # frames before skip-frames, and up to record-start-frame, are not written, so they are seeked past
+        frameCnt = self.seekToFrame(cap, max(maxSkipCnt, config['record-start-frame'] + 1))
         try:
             while cap.isOpened():
                 totalStartTime = startTime = time.time()
                 ret, frame = cap.read()
                 endTime = time.time()
                               
-                skipCnt += 1
-                if (skipCnt < maxSkipCnt):
-                    #self.debug("skipping frame:"+str(frameCnt))
-                    frameCnt += 1
-                    continue
                 if (ret == True):
                     frameStats += ":" + str(frameCnt) + " Read: {:.4f}".format(endTime - startTime)
 
@@ -2256,7 +2574,8 @@ class CVDemo():
                     self.print(frameStats)
                     frameStats = "Frame"
                 else:
-                    self.debug("frame reading error:"+str(cnt))
+                    self.debug("frame reading error:"+str(frameCnt))
+                    break
 
                 if (frameCnt > config['record-end-frame']):
                     break
@@ -2372,7 +2691,7 @@ class CVDemo():
         self.print("   width:"+str(cap.get(cv2.CAP_PROP_FRAME_WIDTH)))
         self.print("   height:"+str(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
         self.print("   fps:"+str(cap.get(cv2.CAP_PROP_FPS)))
-        #self.print("   frame count:"+str(self.count_frames_manual(cv2.VideoCapture(inVideoPath))))
+        self.print("   frame count:"+str(self.countFrames(inVideoPath)))
    
         frameStats = "Frame"
         rowHeight = 25
@@ -2410,19 +2729,14 @@ class CVDemo():
         self.print("recordStartFrame:"+str(recordStartFrame))
         self.print("recordEndFrame:"+str(recordEndFrame))
 
-        frameCnt = 1
-        skipCnt = 0
+        # frames before skip-frames, and up to record-start-frame, are never written, so they are seeked past
+        frameCnt = self.seekToFrame(cap, max(maxSkipCnt, recordStartFrame + 1))
         row = 1
         try:
             while cap.isOpened():
                 totalStartTime = startTime = time.time()
                 ret, frame = cap.read()
                 endTime = time.time()
-                skipCnt += 1
-                if (skipCnt < maxSkipCnt):
-                    #self.debug("skipping frame:"+str(frameCnt))
-                    frameCnt += 1
-                    continue
                 if (ret == True):
                     frameStats += ":"+str(frameCnt) +" Read: {:.4f}".format(endTime-startTime)
                    
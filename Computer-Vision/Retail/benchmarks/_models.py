@@ -0,0 +1,45 @@
+# Makes the BYOP model in ../models/model-with-pixel-intensity importable from
+# the benchmark scripts.
+
+import importlib.util
+import os
+import sys
+import types
+
+here = os.path.dirname(os.path.abspath(__file__))
+models_dir = os.path.join(here, "..", "models")
+pixel_intensity_file = os.path.join(models_dir, "model-with-pixel-intensity", "model-with-pixel-intensity.py")
+default_model = os.path.join(models_dir, "frcnn-resnet.pt.onnx")
+
+# `mac` ships with the Wallaroo model runtime; outside it, stand in for the
+# few pieces the model uses
+try:
+    import mac.inference  # noqa: F401
+except ImportError:
+    class Inference:
+        @property
+        def model(self):
+            return self._model
+
+        @model.setter
+        def model(self, model):
+            self._model = model
+
+        def _raise_error_if_model_is_wrong_type(self, model):
+            if not isinstance(model, tuple(self.expected_model_types)):
+                raise TypeError(f"expected one of {self.expected_model_types}, got {type(model)}")
+
+    modules = {name: types.ModuleType(name) for name in
+               ["mac", "mac.config", "mac.config.inference", "mac.inference", "mac.inference.creation", "mac.types"]}
+    modules["mac.config.inference"].CustomInferenceConfig = object
+    modules["mac.inference"].Inference = Inference
+    modules["mac.inference.creation"].InferenceBuilder = object
+    modules["mac.types"].InferenceData = dict
+    sys.modules.update(modules)
+
+
+def load_pixel_intensity():
+    spec = importlib.util.spec_from_file_location("model_with_pixel_intensity", pixel_intensity_file)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
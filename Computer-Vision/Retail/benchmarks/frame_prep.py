@@ -0,0 +1,68 @@
+# Per-frame preprocessing cost of CVDemo: the old cvtColor, transpose,
+# expand_dims, /255.0 (float64), torch.FloatTensor, .numpy() path against
+# frameToTensor, which writes RGB channels-first float32 in one pass, into a
+# new array or the thread's reusable buffer. All must produce the same tensor.
+#
+# Needs the notebook environment CVDemoUtils imports (cv2, torch, ...).
+#
+# usage: python frame_prep.py [--frames 200] [--width 640] [--height 480]
+
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from CVDemoUtils import CVDemo  # noqa: E402
+
+
+# the conversion every converter used to repeat
+def old_frame_to_tensor(frame):
+    image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    image = image.transpose((2, 0, 1))
+    image = np.expand_dims(image, axis=0)
+    image = image / 255.0
+    tensor = torch.FloatTensor(image)
+    return tensor.cpu().numpy()
+
+
+def time_frames(convert, frames):
+    convert(frames[0])
+    seconds = []
+    for frame in frames:
+        start = time.perf_counter()
+        convert(frame)
+        seconds.append(time.perf_counter() - start)
+    return np.asarray(seconds) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CVDemo frame preprocessing cost per frame")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    args = parser.parse_args()
+
+    cvDemo = CVDemo()
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (args.height, args.width, 3), dtype=np.uint8) for _ in range(8)]
+    frames = [frames[i % len(frames)] for i in range(args.frames)]
+
+    assert np.array_equal(old_frame_to_tensor(frames[0]), cvDemo.frameToTensor(frames[0]))
+
+    print(f"{args.frames} frames of {args.width}x{args.height}")
+    print(f"{'path':>22} {'mean ms':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    paths = {
+        "cv2 + torch": old_frame_to_tensor,
+        "frameToTensor": cvDemo.frameToTensor,
+        "frameToTensor, buffer": lambda frame: cvDemo.frameToTensor(frame, out=cvDemo.tensorBuffer(frame)),
+        "convertFrameToTensor": cvDemo.convertFrameToTensor,
+    }
+    for name, convert in paths.items():
+        ms = time_frames(convert, frames)
+        print(f"{name:>22} {ms.mean():>8.3f} {np.percentile(ms, 50):>8.3f} {np.percentile(ms, 99):>8.3f}")
@@ -0,0 +1,56 @@
+# Frames per second of PixIntensityResnet._predict for the same frames with
+# Faster R-CNN exported for different batch sizes.
+#
+# Export a model per batch size with CVDemo.loadPytorchAndConvertToOnnx(...,
+# batch_size=n), renaming each frcnn-resnet.pt.onnx as it is written, e.g.
+# frcnn-resnet-b4.pt.onnx. Every model is given the same frames, so their
+# per-frame outputs must agree.
+#
+# usage: python pixel_intensity_batch.py --models ../models/frcnn-resnet.pt.onnx ../models/frcnn-resnet-b4.pt.onnx
+#                                         [--frames 16] [--repeat 3]
+
+import argparse
+import time
+
+import numpy as np
+import onnx
+
+from _models import default_model, load_pixel_intensity
+
+
+def _best(f, repeat):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = f()
+        seconds.append(time.perf_counter() - start)
+    return min(seconds), result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PixIntensityResnet throughput by exported batch size")
+    parser.add_argument("--models", nargs="+", default=[default_model])
+    parser.add_argument("--frames", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per model; the fastest is reported")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    args = parser.parse_args()
+
+    pixel_intensity = load_pixel_intensity()
+    frames = np.random.default_rng(0).random((args.frames, 3, args.height, args.width), dtype=np.float32)
+
+    print(f"{args.frames} frames of {args.width}x{args.height}, best of {args.repeat}")
+    print(f"{'model':>40} {'batch':>6} {'seconds':>9} {'frames/s':>9}")
+    reference = None
+    for path in args.models:
+        inference = pixel_intensity.PixIntensityResnet()
+        inference.model = onnx.load(path)
+        batch_size = pixel_intensity._session_batch_size(inference._session) or "any"
+
+        inference._predict({"tensor": frames[:1]})
+        seconds, result = _best(lambda: inference._predict({"tensor": frames}), args.repeat)
+        if reference is None:
+            reference = result
+        assert np.allclose(reference["avg_confidence"], result["avg_confidence"], atol=1e-4, equal_nan=True), \
+            f"{path} disagrees with {args.models[0]}"
+        print(f"{path[-40:]:>40} {batch_size:>6} {seconds:>9.3f} {args.frames / seconds:>9.1f}")
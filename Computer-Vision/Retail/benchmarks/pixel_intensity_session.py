@@ -0,0 +1,62 @@
+# Per-request latency of PixIntensityResnet._predict with the session built
+# for every request, as it used to be, against the session built once when
+# the model is set.
+#
+# The model files are downloaded separately (see ../models/README.md).
+#
+# usage: python pixel_intensity_session.py [--model ../models/frcnn-resnet.pt.onnx] [--requests 20]
+
+import argparse
+import time
+
+import numpy as np
+import onnx
+import onnxruntime as ort
+
+from _models import default_model, load_pixel_intensity
+
+
+def _summary(seconds):
+    milliseconds = np.asarray(seconds) * 1000
+    return (f"mean {milliseconds.mean():9.1f}  p50 {np.percentile(milliseconds, 50):9.1f}  "
+            f"p99 {np.percentile(milliseconds, 99):9.1f} ms")
+
+
+# the old _predict: a new session from the serialized model per request
+def predict_rebuilding(model, frame):
+    session = ort.InferenceSession(model.SerializeToString(), providers=["CPUExecutionProvider"])
+    return session.run(None, {"data": frame})
+
+
+def time_requests(predict, frame, n_requests):
+    predict(frame)
+    seconds = []
+    for _ in range(n_requests):
+        start = time.perf_counter()
+        predict(frame)
+        seconds.append(time.perf_counter() - start)
+    return seconds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PixIntensityResnet latency, per-request vs cached session")
+    parser.add_argument("--model", default=default_model)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    args = parser.parse_args()
+
+    pixel_intensity = load_pixel_intensity()
+    model = onnx.load(args.model)
+    frame = np.random.default_rng(0).random((1, 3, args.height, args.width), dtype=np.float32)
+
+    start = time.perf_counter()
+    inference = pixel_intensity.PixIntensityResnet()
+    inference.model = model
+    print(f"session build: {(time.perf_counter() - start) * 1000:.1f} ms, once per model")
+
+    before = time_requests(lambda x: predict_rebuilding(model, x), frame, args.requests)
+    after = time_requests(lambda x: inference._predict({"tensor": x}), frame, args.requests)
+    print(f"per-request session: {_summary(before)}")
+    print(f"cached session:      {_summary(after)}")
+    print(f"speedup: {np.mean(before) / np.mean(after):.2f}x")
@@ -0,0 +1,136 @@
+from pathlib import Path
+from typing import Any, Optional, Set
+
+import numpy as np
+import onnx
+import onnxruntime as ort
+
+from mac.config.inference import CustomInferenceConfig
+from mac.inference import Inference
+from mac.inference.creation import InferenceBuilder
+from mac.types import InferenceData
+
+# session settings, applied when the model is set
+default_graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+# 0 lets onnxruntime choose
+default_intra_op_threads = 0
+default_inter_op_threads = 0
+
+
+# Expected input:
+# A Dictionary with fields 'outputs',
+# which contains a list with an element that is a dictionary
+# with the fields 'data' - native array of outputs
+#                 'dim' - of data
+#                 'v'
+class PixIntensityResnet(Inference):
+    @property
+    def expected_model_types(self) -> Set[Any]:
+        return {onnx.onnx_ml_pb2.ModelProto}
+
+    @Inference.model.setter  # type: ignore
+    def model(self, model) -> None:
+        """Sets the model on which the inference is calculated.
+
+        :param model: A model instance on which the inference is calculated.
+
+        :raises TypeError: If the model is not an instance of expected_model_types
+            (i.e. KMeans).
+        """
+        self._raise_error_if_model_is_wrong_type(
+            model
+        )  # this will make sure an error will be raised if the model is of wrong type
+        self._model = model
+        # built once here rather than per request: serializing the protobuf and
+        # building the graph costs hundreds of milliseconds for Faster R-CNN.
+        # InferenceSession.run is thread-safe, so concurrent requests share it.
+        self._session = self._create_session(model)
+
+    @staticmethod
+    def _create_session(model) -> ort.InferenceSession:
+        options = ort.SessionOptions()
+        options.graph_optimization_level = default_graph_optimization_level
+        options.intra_op_num_threads = default_intra_op_threads
+        options.inter_op_num_threads = default_inter_op_threads
+        return ort.InferenceSession(
+            model.SerializeToString(), options, providers=["CPUExecutionProvider"]
+        )
+
+    def _predict(self, input_data: InferenceData):
+        # Parse inputs, a batch of N frames
+        inputs = input_data["tensor"].astype(np.float32)
+
+        # Pass to onnx model
+        # CVDemoUtils.loadPytorchAndConvertToOnnx() exports Faster R-CNN for a
+        # fixed batch, with boxes, classes and confidences for every frame, so
+        # the frames are run a model batch at a time and the outputs split per frame
+        model_batch_size = _session_batch_size(self._session)
+        batch_size = model_batch_size or len(inputs)
+        per_frame = []
+        for start in range(0, len(inputs), batch_size):
+            batch = inputs[start:start + batch_size]
+            n = len(batch)
+            if n < batch_size:
+                # pad with copies of the last frame, whose outputs are dropped
+                batch = np.concatenate([batch, np.repeat(batch[-1:], batch_size - n, axis=0)])
+            outputs = self._session.run(None, {"data": batch})
+            per_frame.extend(_split_outputs(outputs, batch_size, batched=model_batch_size is None)[:n])
+
+        boxes, classes, confidences = zip(*per_frame)
+
+        # Calculate input derivatives
+        avg_px_intensity = inputs.reshape(len(inputs), -1).mean(axis=1)
+
+        # Calculate output derivatives
+        avg_confidence = [np.mean(c) for c in confidences]
+
+        # frames have different numbers of detections; a batch of outputs is
+        # padded to the most detections with zero boxes, classes and confidences
+        return {
+            "boxes": _stack_padded(boxes),
+            "classes": _stack_padded(classes),
+            "confidences": _stack_padded(confidences),
+            "avg_px_intensity": avg_px_intensity.reshape(-1, 1),
+            "avg_confidence": np.array(avg_confidence).reshape(-1, 1),
+        }
+
+
+# the number of frames the session takes per run, or None if its batch
+# dimension is dynamic
+def _session_batch_size(session) -> Optional[int]:
+    batch_size = session.get_inputs()[0].shape[0]
+    return batch_size if isinstance(batch_size, int) else None
+
+
+# boxes, classes, confidences for each of batch_size frames, each without a
+# batch dimension, e.g. boxes (detections, 4): three outputs per frame as
+# exported, or, when batched (the model's batch dimension is dynamic), three
+# outputs batched along their first axis, even for a batch of one
+def _split_outputs(outputs, batch_size, batched=False):
+    if not batched and len(outputs) == 3 * batch_size:
+        return [outputs[3 * i:3 * i + 3] for i in range(batch_size)]
+    return [[output[i] for output in outputs[:3]] for i in range(batch_size)]
+
+
+def _stack_padded(arrays) -> np.ndarray:
+    longest = max(len(a) for a in arrays)
+    stacked = np.zeros((len(arrays), longest) + arrays[0].shape[1:], dtype=arrays[0].dtype)
+    for i, a in enumerate(arrays):
+        stacked[i, :len(a)] = a
+    return stacked
+
+
+class PixIntensityResnetBuilder(InferenceBuilder):
+    @property
+    def inference(self) -> PixIntensityResnet:
+        return PixIntensityResnet
+
+    def create(self, config: CustomInferenceConfig) -> PixIntensityResnet:
+        inference = self.inference()
+        inference.model = self._load_model(
+            config.model_path / "frcnn-resnet.pt.onnx"
+        )
+        return inference
+
+    def _load_model(self, file_path: Path) -> onnx.onnx_ml_pb2.ModelProto:
+        return onnx.load(file_path)
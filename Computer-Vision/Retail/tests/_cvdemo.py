@@ -0,0 +1,28 @@
+# Selected CVDemo methods, compiled from CVDemoUtils.py without importing it,
+# for tests that have to run without the notebook environment CVDemoUtils
+# imports (cv2, torch, wallaroo, ...). The methods see only the module
+# globals passed in.
+
+import ast
+import os
+import threading
+
+path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "CVDemoUtils.py")
+
+
+def load_methods(names, **namespace):
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    cvdemo = next(node for node in tree.body if isinstance(node, ast.ClassDef) and node.name == "CVDemo")
+    methods = [node for node in cvdemo.body if isinstance(node, ast.FunctionDef) and node.name in names]
+    assert sorted(method.name for method in methods) == sorted(names)
+
+    exec(compile(ast.Module(body=methods, type_ignores=[]), path, "exec"), namespace)
+
+    def __init__(self):
+        self._frameBuffers = threading.local()
+
+    attributes = {name: namespace[name] for name in names}
+    attributes["__init__"] = __init__
+    attributes["debug"] = lambda self, message: None
+    return type("CVDemoMethods", (), attributes)
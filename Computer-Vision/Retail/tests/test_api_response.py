@@ -0,0 +1,62 @@
+# Parsing of the pipeline endpoint's responses in CVDemo.runInferenceOnFrameUsingApi.
+#
+# Needs the notebook environment CVDemoUtils imports (cv2, torch, wallaroo, ...);
+# the tests are skipped without it.
+#
+# usage: python -m pytest tests
+
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+CVDemoUtils = pytest.importorskip("CVDemoUtils")
+
+# one record of an arrow inference response as the endpoint returns it without
+# dataset.separator, the outputs nested under out
+nested_records = [{
+    "time": 1700000000000,
+    "in": {"tensor": [[[0.0, 0.5], [0.25, 1.0]]]},
+    "out": {
+        "boxes": [10.0, 20.0, 110.0, 220.0, 5.0, 6.0, 7.0, 8.0],
+        "classes": [44, 1],
+        "confidences": [0.98, 0.12],
+    },
+    "check_failures": [],
+    "metadata": {"last_model": "{\"model_name\":\"mobilenet\"}", "pipeline_version": "", "elapsed": [1, 2]},
+}]
+
+# the same record with dataset.separator=.
+flat_records = [{
+    "time": 1700000000000,
+    "out.boxes": nested_records[0]["out"]["boxes"],
+    "out.classes": nested_records[0]["out"]["classes"],
+    "out.confidences": nested_records[0]["out"]["confidences"],
+    "check_failures": [],
+}]
+
+
+@pytest.mark.parametrize("records", [nested_records, flat_records], ids=["nested", "flat"])
+def test_arrow_response_to_inference_result(records):
+    demo = CVDemoUtils.CVDemo()
+    infResult = demo.convertWallarooResultToInferenceResultDataframe(demo.apiRecordsToDataframe(records))
+
+    assert infResult['boxes'].tolist() == [[10.0, 20.0, 110.0, 220.0, 5.0, 6.0, 7.0, 8.0]]
+    assert infResult['classes'].tolist() == [[44, 1]]
+    assert infResult['confidences'].tolist() == [[0.98, 0.12]]
+
+
+def test_http_session_per_thread():
+    demo = CVDemoUtils.CVDemo()
+    sessions = []
+    threads = [threading.Thread(target=lambda: sessions.append(demo.getHttpSession())) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert demo.getHttpSession() is demo.getHttpSession()
+    assert len({id(session) for session in sessions + [demo.getHttpSession()]}) == 4
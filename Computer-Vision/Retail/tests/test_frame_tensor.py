@@ -0,0 +1,64 @@
+# Ownership of the tensors CVDemo.frameToTensor and its converters return: a
+# tensor a caller keeps is its own, and only an explicit
+# out=tensorBuffer(frame) shares the thread's buffer.
+#
+# usage: python -m pytest tests
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _cvdemo import load_methods  # noqa: E402
+
+CVDemo = load_methods(
+    ["tensorBuffer", "frameToTensor", "convertFrameToTensor", "convertFrameToTensorDataframe"],
+    np=np, pd=pd,
+)
+
+height, width = 4, 6
+
+
+def frames(n):
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(n)]
+
+
+def expected(frame):
+    return (frame[:, :, ::-1].transpose((2, 0, 1)) / np.float32(255.0))[np.newaxis].astype(np.float32)
+
+
+def test_dataframe_keeps_its_frame():
+    demo = CVDemo()
+    first, second = frames(2)
+
+    df = demo.convertFrameToTensorDataframe(first, width, height)
+    demo.convertFrameToTensorDataframe(second, width, height)
+    demo.frameToTensor(second, out=demo.tensorBuffer(second))
+
+    np.testing.assert_array_equal(df["tensor"][0], expected(first))
+
+
+def test_converted_tensors_are_not_shared():
+    demo = CVDemo()
+    first, second = frames(2)
+
+    tensor = demo.convertFrameToTensor(first)
+    demo.frameToTensor(second, out=demo.tensorBuffer(second))
+
+    assert not np.shares_memory(tensor, demo.tensorBuffer(first))
+    np.testing.assert_array_equal(tensor, expected(first))
+    np.testing.assert_array_equal(demo.frameToTensor(second), expected(second))
+
+
+def test_buffer_is_reused_per_frame_size():
+    demo = CVDemo()
+    first, second = frames(2)
+
+    buffer = demo.tensorBuffer(first)
+
+    assert demo.frameToTensor(second, out=demo.tensorBuffer(second)) is buffer
+    assert demo.tensorBuffer(np.zeros((height + 1, width, 3), dtype=np.uint8)).shape == (1, 3, height + 1, width)
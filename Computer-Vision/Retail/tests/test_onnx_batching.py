@@ -0,0 +1,121 @@
+# Per-frame outputs of the batched onnx inference in PixIntensityResnet._predict
+# and CVDemo.inferUsingOnnx.
+#
+# Small onnx models stand in for Faster R-CNN: one exported for a fixed batch
+# with boxes_i, classes_i, confidences_i per frame, as
+# CVDemo.loadPytorchAndConvertToOnnx writes it, and one with a dynamic batch
+# dimension and batched outputs. Whatever the model and however many frames,
+# every frame's boxes are (detections, 4) and its classes and confidences
+# (detections,), as a single-frame export returns them.
+#
+# usage: python -m pytest tests
+
+import os
+import sys
+
+import numpy as np
+import onnxruntime as ort
+import pytest
+from onnx import TensorProto, helper
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, "..", "benchmarks"))
+sys.path.insert(0, os.path.join(here, ".."))
+
+from _models import load_pixel_intensity  # noqa: E402
+
+height, width = 2, 4
+
+
+def _frame_nodes(frame, suffix):
+    # boxes are the frame's first channel, classes and confidences the max and
+    # mean of each row over the channels: two detections per frame
+    return [
+        helper.make_node("Gather", [frame, "zero"], ["boxes" + suffix], axis=-3),
+        helper.make_node("ReduceMax", [frame], ["max" + suffix], axes=[-3, -1], keepdims=0),
+        helper.make_node("Cast", ["max" + suffix], ["classes" + suffix], to=TensorProto.INT64),
+        helper.make_node("ReduceMean", [frame], ["confidences" + suffix], axes=[-3, -1], keepdims=0),
+    ]
+
+
+def _outputs(suffix, batch):
+    return [
+        helper.make_tensor_value_info("boxes" + suffix, TensorProto.FLOAT, batch + [height, width]),
+        helper.make_tensor_value_info("classes" + suffix, TensorProto.INT64, batch + [height]),
+        helper.make_tensor_value_info("confidences" + suffix, TensorProto.FLOAT, batch + [height]),
+    ]
+
+
+def _model(nodes, batch, outputs):
+    data = helper.make_tensor_value_info("data", TensorProto.FLOAT, [batch, 3, height, width])
+    zero = helper.make_tensor("zero", TensorProto.INT64, [], [0])
+    graph = helper.make_graph(nodes, "frames", [data], outputs, initializer=[zero])
+    return helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)], ir_version=8)
+
+
+def dynamic_batch_model():
+    return _model(_frame_nodes("data", ""), "N", _outputs("", ["N"]))
+
+
+def fixed_batch_model(batch_size):
+    nodes, outputs = [], []
+    for i in range(batch_size):
+        suffix = "" if batch_size == 1 else "_" + str(i)
+        index = helper.make_tensor("index" + suffix, TensorProto.INT64, [], [i])
+        nodes.append(helper.make_node("Constant", [], ["i" + suffix], value=index))
+        nodes.append(helper.make_node("Gather", ["data", "i" + suffix], ["frame" + suffix], axis=0))
+        nodes.extend(_frame_nodes("frame" + suffix, suffix))
+        outputs.extend(_outputs(suffix, []))
+    return _model(nodes, batch_size, outputs)
+
+
+def expected(frame):
+    return frame[0], frame.max(axis=(0, 2)).astype(np.int64), frame.mean(axis=(0, 2))
+
+
+models = {
+    "dynamic": dynamic_batch_model,
+    "fixed-1": lambda: fixed_batch_model(1),
+    "fixed-2": lambda: fixed_batch_model(2),
+}
+
+
+@pytest.mark.parametrize("model", list(models))
+@pytest.mark.parametrize("n_frames", [1, 3])
+def test_predict_per_frame_outputs(model, n_frames):
+    pixel_intensity = load_pixel_intensity()
+    inference = pixel_intensity.PixIntensityResnet()
+    inference.model = models[model]()
+    frames = np.random.default_rng(0).random((n_frames, 3, height, width), dtype=np.float32)
+
+    result = inference._predict({"tensor": frames})
+
+    assert result["boxes"].shape == (n_frames, height, width)
+    assert result["classes"].shape == (n_frames, height)
+    assert result["confidences"].shape == (n_frames, height)
+    for i, frame in enumerate(frames):
+        boxes, classes, confidences = expected(frame)
+        np.testing.assert_allclose(result["boxes"][i], boxes, rtol=1e-6)
+        np.testing.assert_array_equal(result["classes"][i], classes)
+        np.testing.assert_allclose(result["confidences"][i], confidences, rtol=1e-6)
+
+
+@pytest.mark.parametrize("model", list(models))
+@pytest.mark.parametrize("n_frames", [1, 3])
+def test_infer_using_onnx_per_frame_outputs(model, n_frames):
+    CVDemoUtils = pytest.importorskip("CVDemoUtils")
+    demo = CVDemoUtils.CVDemo()
+    session = ort.InferenceSession(models[model]().SerializeToString(), providers=["CPUExecutionProvider"])
+    frames = list(np.random.default_rng(0).integers(0, 256, (n_frames, height, width, 3), dtype=np.uint8))
+
+    results = demo.inferUsingOnnx(frames, {"onnx-session": session})
+    single = demo.inferUsingOnnx(frames[0], {"onnx-session": session})
+
+    assert len(results) == n_frames
+    for frame, result in zip(frames + [frames[0]], results + [single]):
+        boxes, classes, confidences = expected(demo.frameToTensor(frame, out=np.empty((1, 3, height, width),
+                                                                                      dtype=np.float32))[0])
+        assert result["boxes"].shape == (height, width)
+        np.testing.assert_allclose(result["boxes"], boxes, rtol=1e-6)
+        np.testing.assert_array_equal(result["classes"], classes)
+        np.testing.assert_allclose(result["confidences"], confidences, rtol=1e-6)
@@ -0,0 +1,96 @@
+# CVDemo.seekToFrame against captures whose seeks snap to key frames and
+# still report success. Runs without cv2: the method is compiled from
+# CVDemoUtils.py with a stand-in for the one cv2 constant it uses.
+#
+# usage: python -m pytest tests
+
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _cvdemo import load_methods  # noqa: E402
+
+cv2 = types.SimpleNamespace(CAP_PROP_POS_FRAMES=1)
+backoff = 4
+CVDemo = load_methods(["seekToFrame"], cv2=cv2, CVDemo=types.SimpleNamespace(SEEK_BACKOFF=backoff))
+
+
+# a capture of nFrames frames whose seeks land on the key frame at or before
+# the target, or after it with snapAfter, and report success either way
+class KeyFrameCapture:
+    def __init__(self, nFrames, keyFrameInterval, snapAfter=False, canSeek=True):
+        self.nFrames = nFrames
+        self.keyFrameInterval = keyFrameInterval
+        self.snapAfter = snapAfter
+        self.canSeek = canSeek
+        self.position = 0
+        self.seeks = []
+        self.grabs = 0
+
+    def set(self, prop, value):
+        assert prop == cv2.CAP_PROP_POS_FRAMES
+        if not self.canSeek:
+            return False
+        self.seeks.append(value)
+        keyFrame = value - value % self.keyFrameInterval
+        if self.snapAfter and keyFrame < value:
+            keyFrame += self.keyFrameInterval
+        self.position = min(keyFrame, self.nFrames)
+        return True
+
+    def get(self, prop):
+        assert prop == cv2.CAP_PROP_POS_FRAMES
+        return float(self.position)
+
+    def grab(self):
+        if self.position >= self.nFrames:
+            return False
+        self.position += 1
+        self.grabs += 1
+        return True
+
+
+@pytest.mark.parametrize("snapAfter", [False, True])
+@pytest.mark.parametrize("frameCnt", [1, 2, 11, 12, 25, 70])
+def test_seek_is_exact(frameCnt, snapAfter):
+    cap = KeyFrameCapture(60, 10, snapAfter)
+
+    nextFrame = CVDemo().seekToFrame(cap, frameCnt)
+
+    assert nextFrame == min(frameCnt, 61)
+    assert cap.position == nextFrame - 1
+
+
+def test_overshoot_backs_off_instead_of_restarting():
+    # every retry lands on the key frame at 100 until the backoff reaches
+    # past the one at 50
+    cap = KeyFrameCapture(1000, 50, snapAfter=True)
+
+    nextFrame = CVDemo().seekToFrame(cap, 61)
+
+    assert nextFrame == 61
+    assert cap.seeks == [60, 60 - backoff, 60 - 2 * backoff, 60 - 4 * backoff]
+    assert cap.grabs == 10
+
+
+def test_overshoot_near_the_start_falls_back_to_the_first_frame():
+    cap = KeyFrameCapture(1000, 50, snapAfter=True)
+
+    nextFrame = CVDemo().seekToFrame(cap, 6)
+
+    assert nextFrame == 6
+    assert cap.seeks == [5, 1, 0]
+    assert cap.grabs == 5
+
+
+def test_unseekable_video_is_grabbed_forward():
+    cap = KeyFrameCapture(60, 10, canSeek=False)
+
+    nextFrame = CVDemo().seekToFrame(cap, 25)
+
+    assert nextFrame == 25
+    assert cap.grabs == 24
@@ -0,0 +1,109 @@
+# Shutdown of the decode / inference / draw pipeline in
+# CVDemo.detectAndClassifyObjectsInVideo when the draw loop stops before the
+# video ends.
+#
+# Inference and drawing are replaced by quick stand-ins on a CVDemo subclass,
+# so only the pipeline itself runs.
+#
+# Needs the notebook environment CVDemoUtils imports (cv2, torch, wallaroo, ...);
+# the tests are skipped without it.
+#
+# usage: python -m pytest tests
+
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+CVDemoUtils = pytest.importorskip("CVDemoUtils")
+cv2 = pytest.importorskip("cv2")
+
+width, height = 64, 48
+
+
+class PipelineDemo(CVDemoUtils.CVDemo):
+    def __init__(self, failFrame=None):
+        super().__init__()
+        self.failFrame = failFrame
+
+    def runInferenceOnFrames(self, frames, configs):
+        time.sleep(0.005)
+        for config in configs:
+            if config['frame-cnt'] == self.failFrame:
+                raise ValueError("inference failed on frame "+str(self.failFrame))
+        return [{'inference-time': 0.0, 'onnx-time': 0.0} for _ in frames]
+
+    def drawDetectedObjectsWithClassification(self, results):
+        return results['image']
+
+    def addInferenceResultsToDashboard(self, results, columns, row, dashboardImage):
+        pass
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = str(tmp_path / "in.mp4")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 10, (width, height))
+    for i in range(60):
+        writer.write(np.full((height, width, 3), i, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+@pytest.fixture
+def threadErrors(monkeypatch):
+    errors = []
+    monkeypatch.setattr(threading, "excepthook", lambda args: errors.append(args.exc_value))
+    return errors
+
+
+def videoConfig(video, tmp_path, **extra):
+    config = {
+        'input-video': video,
+        'output-video': str(tmp_path / "out.mp4"),
+        'fps': 10,
+        'width': width,
+        'height': height,
+        'endpoint-url': '',
+        'inference': 'WALLAROO_API',
+        'model_name': 'model',
+        'pipeline_name': 'pipeline',
+        'confidence-target': 0.5,
+        'color': (255, 255, 255),
+        'inference-workers': 4,
+        'stats-interval': 0,
+    }
+    config.update(extra)
+    return config
+
+
+def decodeThreads():
+    return [thread for thread in threading.enumerate() if thread.name == "decode"]
+
+
+@pytest.mark.parametrize("batchSize", [1, 3])
+def test_record_end_frame_stops_cleanly(video, tmp_path, threadErrors, batchSize):
+    config = videoConfig(video, tmp_path, **{'record-start-frame': 2, 'record-end-frame': 6,
+                                             'inference-batch-size': batchSize})
+
+    PipelineDemo().detectAndClassifyObjectsInVideo(config)
+
+    assert threadErrors == []
+    assert decodeThreads() == []
+    assert config['video-stats']['frames'] == 3
+
+
+def test_inference_error_stops_cleanly(video, tmp_path, threadErrors):
+    config = videoConfig(video, tmp_path)
+
+    with pytest.raises(ValueError):
+        PipelineDemo(failFrame=5).detectAndClassifyObjectsInVideo(config)
+
+    assert threadErrors == []
+    assert decodeThreads() == []
+
@@ -4,6 +4,7 @@ import pandas as pd
 import pyarrow as pa
 import cv2
 import wallaroo
+from WallarooResolver import get_resolver
 import torch
 import pickle
 from datetime import datetime
@@ -11,13 +12,7 @@ import time
 import matplotlib.pyplot as plt
 
 def getWorkspace(wl, ws_name):
-    workspace = None
-    for ws in wl.list_workspaces():
-        if ws.name() == ws_name:
-            workspace= ws
-    if(workspace == None):
-        workspace = wl.create_workspace(ws_name)
-    return workspace
+    return get_resolver(wl).workspace(ws_name, create=True)
 
 def get_pipeline(wl, name):
     try:
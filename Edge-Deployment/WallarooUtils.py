@@ -9,6 +9,8 @@ import json
 
 # S3 Bucket Tools
 import os
+
+from WallarooResolver import get_resolver
 #import boto3
 #from boto3 import session
 #import botocore
@@ -22,14 +24,7 @@ class Util():
         wl = wallaroo.Client()
     
     def get_workspace(self, name):
-        wl = wallaroo.Client()
-        workspace = None
-        for ws in wl.list_workspaces():
-            if ws.name() == name:
-                workspace= ws
-        if(workspace == None):
-            workspace = wl.create_workspace(name)
-        return workspace
+        return get_resolver(wl).workspace(name, create=True)
 
     def get_pipeline(self, name):
         try:
@@ -39,18 +34,18 @@ class Util():
             pipeline = wl.build_pipeline(pipeline_name)
         return pipeline
 
-    def get_model(self, mname):
-        modellist = wl.get_current_workspace().models()
-        model = [m.versions()[0] for m in modellist if m.name() == mname]
-        if len(model) <= 0:
-            #raise KeyError(f"model {mname} not found in this workspace")
-            mobilenet_model = wl.upload_model(model_name, model_file_name)
-            modellist = wl.get_current_workspace().models()
-            model = [m.versions()[0] for m in modellist if m.name() == mname]
-            if len(model) <= 0:
-                    #raise KeyError(f"model {mname} not found in this workspace")
-                    mobilenet_model = wl.upload_model(model_name, model_file_name)
-        return model[0]
+    # the model mname in the current workspace, uploaded from model_file_name
+    # if it is not there yet
+    def get_model(self, mname, model_file_name=None):
+        workspace = wl.get_current_workspace()
+        resolver = get_resolver(wl)
+        model = resolver.model(mname, workspace)
+        if model is None:
+            if model_file_name is None:
+                raise KeyError(f"model {mname} not found in this workspace")
+            model = wl.upload_model(mname, model_file_name)
+            resolver.add_model(model, workspace)
+        return model
 
     def convert_data(self,tensor,name):
         # get npArray from the tensorFloat
@@ -1,8 +1,15 @@
 import json
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 
 from statsmodels.tsa.arima.model import ARIMA
 
+# worker processes used to fit the rows of one request; 1 fits them in-process
+n_workers = 1
+
+_pool = None
+_pool_workers = 0
+
 def _fit_model(dataframe):
     model = ARIMA(dataframe['count'], 
                     order=(1, 1, 0)
@@ -10,9 +17,9 @@ def _fit_model(dataframe):
     return model
 
 
-def wallaroo_json(data: pd.DataFrame):
+def _forecast(series):
 
-    evaluation_frame = pd.DataFrame({"count": data.loc[0, 'count']})
+    evaluation_frame = pd.DataFrame({"count": series})
 
     nforecast = 7
     model = _fit_model(evaluation_frame)
@@ -23,8 +30,30 @@ def wallaroo_json(data: pd.DataFrame):
     # get the average across the week
     weekly_average = forecast.mean()
 
-    return [
-        { "forecast" : forecast.tolist(),
-          "weekly_average": [weekly_average] 
-        }
-    ]
+    return { "forecast" : forecast.tolist(),
+             "weekly_average": [weekly_average] 
+           }
+
+
+# the pool is kept between requests so only the first one pays for starting it;
+# it is replaced when n_workers changes
+def _get_pool(workers):
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = ProcessPoolExecutor(max_workers=workers)
+        _pool_workers = workers
+    return _pool
+
+
+def wallaroo_json(data: pd.DataFrame):
+
+    # every row is forecast, and the results keep the order of the rows
+    series = data['count'].tolist()
+
+    workers = n_workers
+    if workers > 1 and len(series) > 1:
+        return list(_get_pool(workers).map(_forecast, series))
+
+    return [_forecast(row) for row in series]
@@ -1,19 +1,287 @@
 # A module to simulate having a data base or other data repository to query from
 
+import hashlib
+import itertools
+import os
+import re
 import sqlite3
+from contextlib import closing
 import pandas as pd
 import numpy as np
 import datetime
 
+from resources import util
+
 _datafile = "./day.csv"
 tablename = "bikerentals"
 
+# bookkeeping table recording which csv a persistent database was built from
+_sourcetable = "_simdb_source"
+
+
 # return a simulated database connection that is backed by datafile
-def get_db_connection(datafile =_datafile, tablename=tablename):
+#
+# With dbfile set, the table is built into that sqlite file once, with an index
+# on date, and later calls reopen it read-only instead of reloading the csv.
+# The file is rebuilt when the csv's modification time and content hash no
+# longer match the ones it was built from. mmap_size > 0 lets sqlite memory-map
+# up to that many bytes of the file.
+#
+# backend="columnar" skips sqlite and returns a ColumnarStore over the csv
+# instead; dbfile and mmap_size do not apply to it.
+def get_db_connection(datafile =_datafile, tablename=tablename, dbfile=None, mmap_size=0, backend="sqlite"):
+    if backend == "columnar":
+        return _get_store(datafile, tablename)
+    if backend != "sqlite":
+        raise ValueError(f"backend must be 'sqlite' or 'columnar', got {backend!r}")
+
+    if dbfile is None:
+        df = _read_datafile(datafile)
+
+        conn = sqlite3.connect(":memory:")
+        df.to_sql(tablename, conn, index=False)
+        return conn
+
+    if not _is_current(dbfile, datafile, tablename):
+        _build(dbfile, datafile, tablename)
+
+    conn = sqlite3.connect(f"file:{os.path.abspath(dbfile)}?mode=ro", uri=True)
+    if mmap_size:
+        conn.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+    return conn
+
+
+def _read_datafile(datafile):
     df = pd.read_csv(datafile)
     df['date'] = df['dteday']
-    
-    conn = sqlite3.connect(":memory:")
-    df.to_sql(tablename, conn, index=False)
-    return conn
+    return df
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _is_current(dbfile, datafile, tablename):
+    if not os.path.exists(dbfile):
+        return False
+
+    try:
+        with closing(sqlite3.connect(f"file:{os.path.abspath(dbfile)}?mode=ro", uri=True)) as conn:
+            row = conn.execute(f"select mtime, sha256 from {_sourcetable} where tablename = ?",
+                               (tablename,)).fetchone()
+    except sqlite3.DatabaseError:
+        return False
+    if row is None:
+        return False
+
+    # an unchanged mtime is taken at its word; a touched but identical csv
+    # costs one hash and a bookkeeping update rather than a rebuild
+    mtime, sha256 = row
+    current_mtime = os.stat(datafile).st_mtime
+    if mtime == current_mtime:
+        return True
+    if sha256 != _file_hash(datafile):
+        return False
+
+    # closing() closes the connection; the inner with commits the update
+    with closing(sqlite3.connect(dbfile)) as conn, conn:
+        conn.execute(f"update {_sourcetable} set mtime = ? where tablename = ?", (current_mtime, tablename))
+    return True
+
+
+# build into a temporary file and move it into place, so readers never see a
+# half-written database
+def _build(dbfile, datafile, tablename):
+    df = _read_datafile(datafile)
+    tmpfile = f"{dbfile}.{os.getpid()}.tmp"
+    if os.path.exists(tmpfile):
+        os.remove(tmpfile)
+
+    conn = sqlite3.connect(tmpfile)
+    try:
+        df.to_sql(tablename, conn, index=False)
+        conn.execute(f"create index {tablename}_date on {tablename} (date)")
+        conn.execute(f"create table {_sourcetable} (tablename text primary key, datafile text, mtime real, sha256 text)")
+        conn.execute(f"insert into {_sourcetable} values (?, ?, ?, ?)",
+                     (tablename, os.path.abspath(datafile), os.stat(datafile).st_mtime, _file_hash(datafile)))
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(tmpfile, dbfile)
+
+
+# stores already loaded, by csv path and table name, with the csv's mtime
+_stores = {}
+
+
+def _get_store(datafile, tablename):
+    key = (os.path.abspath(datafile), tablename)
+    mtime = os.stat(datafile).st_mtime
+    cached = _stores.get(key)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, ColumnarStore(_read_datafile(datafile), tablename))
+        _stores[key] = cached
+    return cached[1]
+
+
+# the date range queries util builds:
+#   select <columns> from <table> where date > <bound> AND date <= <bound> [order by date]
+# where a bound is ?, a quoted date, or DATE(<bound>) with an optional '-1 month'
+_range_query = re.compile(
+    r"^\s*select\s+(?P<columns>\*|\w+(?:\s*,\s*\w+)*)\s+from\s+(?P<table>\w+)"
+    r"\s+where\s+date\s*>\s*(?P<lower>.+?)\s+and\s+date\s*<=\s*(?P<upper>.+?)"
+    r"(?:\s+order\s+by\s+date(?:\s+asc)?)?\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL)
+_date_call = re.compile(r"^date\((?P<arg>.+?)(?:,\s*'(?P<modifier>[^']*)')?\)$", re.IGNORECASE | re.DOTALL)
+
+
+def _eval_bound(expr, params):
+    expr = expr.strip()
+    if expr == "?":
+        try:
+            return np.datetime64(next(params), 'D')
+        except StopIteration:
+            raise sqlite3.ProgrammingError("not enough parameters for the query") from None
+    if len(expr) > 1 and expr[0] == expr[-1] == "'":
+        return np.datetime64(expr[1:-1], 'D')
+
+    match = _date_call.match(expr)
+    if match is None:
+        raise sqlite3.NotSupportedError(f"unsupported date bound {expr!r}")
+    day = _eval_bound(match['arg'], params)
+    modifier = match['modifier']
+    if modifier is None:
+        return day
+    if modifier.strip().lower() != "-1 month":
+        raise sqlite3.NotSupportedError(f"unsupported date modifier {modifier!r}")
+    return util.month_before(day)
+
+
+# An in-memory, read-only stand-in for the sqlite connection, for the one
+# access pattern the forecasts have: a contiguous date range of a table
+# that is only ever read.
+#
+# The csv is held as one numpy array per column, sorted by date, with the
+# dates as datetime64[D] for binary search. range, ranges and window return
+# views into those arrays, so a query copies nothing; the arrays are
+# read-only because every caller with the same csv shares them.
+#
+# execute and cursor take the date range queries util builds, with the same
+# results sqlite gives, so code written against a sqlite connection can
+# switch backends without changes. Anything else raises
+# sqlite3.NotSupportedError.
+class ColumnarStore:
+    def __init__(self, df, tablename=tablename):
+        df = df.sort_values('date', kind='stable')
+        self.tablename = tablename
+        self.dates = np.array(df['date'], dtype='datetime64[D]')
+        self.dates.setflags(write=False)
+        self.columns = {}
+        for name in df.columns:
+            column = df[name].to_numpy()
+            column.setflags(write=False)
+            self.columns[name] = column
+
+    def __len__(self):
+        return len(self.dates)
+
+    # the rows with start < date <= end, as a view of column
+    def range(self, start, end, column="cnt"):
+        lo, hi = np.searchsorted(self.dates, np.array([start, end], dtype='datetime64[D]'), side='right')
+        return self.columns[column][lo:hi]
+
+    # range for many (start, end) pairs at once; one view per pair
+    def ranges(self, starts, ends, column="cnt"):
+        values = self.columns[column]
+        los = np.searchsorted(self.dates, np.asarray(starts, dtype='datetime64[D]'), side='right')
+        his = np.searchsorted(self.dates, np.asarray(ends, dtype='datetime64[D]'), side='right')
+        return [values[lo:hi] for lo, hi in zip(los, his)]
+
+    # one month of column prior to forecast_day, inclusive, as
+    # util.mk_dt_range_query selects it
+    def window(self, forecast_day, column="cnt"):
+        day = np.datetime64(forecast_day, 'D')
+        return self.range(util.month_before(day), day, column)
+
+    def cursor(self):
+        return ColumnarCursor(self)
+
+    def execute(self, query, parameters=()):
+        return self.cursor().execute(query, parameters)
+
+    # the connection methods that mean nothing for a read-only store
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+# A DB-API style cursor over a ColumnarStore, enough for pd.read_sql and
+# code that calls execute(...).fetchall(). fetcharrays returns the result
+# as column views instead of rows.
+class ColumnarCursor:
+    arraysize = 1
+
+    def __init__(self, store):
+        self.store = store
+        self.description = None
+        self._arrays = {}
+        self._rows = iter(())
+
+    def execute(self, query, parameters=()):
+        match = _range_query.match(query)
+        if match is None:
+            raise sqlite3.NotSupportedError(f"the columnar backend only answers date range queries: {query!r}")
+        if match['table'] != self.store.tablename:
+            raise sqlite3.OperationalError(f"no such table: {match['table']}")
+
+        if match['columns'] == "*":
+            names = list(self.store.columns)
+        else:
+            names = [name.strip() for name in match['columns'].split(",")]
+        unknown = [name for name in names if name not in self.store.columns]
+        if unknown:
+            raise sqlite3.OperationalError(f"no such column: {unknown[0]}")
+
+        params = iter(parameters)
+        lower = _eval_bound(match['lower'], params)
+        upper = _eval_bound(match['upper'], params)
+        if any(True for _ in params):
+            raise sqlite3.ProgrammingError("too many parameters for the query")
+
+        lo, hi = np.searchsorted(self.store.dates, np.array([lower, upper]), side='right')
+        self._arrays = {name: self.store.columns[name][lo:hi] for name in names}
+        self.description = tuple((name, None, None, None, None, None, None) for name in names)
+        self._rows = zip(*(self._arrays[name].tolist() for name in names))
+        return self
+
+    def fetcharrays(self):
+        return self._arrays
+
+    def fetchone(self):
+        return next(self._rows, None)
+
+    def fetchmany(self, size=None):
+        return list(itertools.islice(self._rows, size or self.arraysize))
+
+    def fetchall(self):
+        return list(self._rows)
+
+    def __iter__(self):
+        return self._rows
 
+    def close(self):
+        self._arrays = {}
+        self._rows = iter(())
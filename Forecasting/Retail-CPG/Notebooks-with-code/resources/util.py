@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
 import datetime
+import functools
 
 from warnings import filterwarnings
 filterwarnings('ignore')
@@ -27,13 +28,70 @@ def mk_dt_range_query(*, tablename: str, forecast_day: str) -> str:
     return query
 
 
+# parameterized version of mk_dt_range_query; execute it with
+# (forecast_day, forecast_day) as the parameters
+def mk_dt_range_query_params(*, tablename: str) -> str:
+    assert tablename.isidentifier()
+    query = f"select cnt from {tablename} where date > DATE(?, '-1 month') AND date <= DATE(?)"
+    return query
+
+
+# sqlite's DATE(day, '-1 month'): the same day of the previous month, with
+# overflowing days rolling into the next month (2011-03-31 gives 2011-03-03)
+def month_before(days):
+    days = np.asarray(days, dtype='datetime64[D]')
+    day_of_month = days - days.astype('datetime64[M]').astype('datetime64[D]')
+    return (days.astype('datetime64[M]') - 1).astype('datetime64[D]') + day_of_month
+
+
+# one month's bike counts prior to each forecast day, inclusive, for many
+# forecast days at once: a single parameterized query covers the span of all
+# the windows, and each window is a slice of the result found by binary
+# search on the sorted dates. Returns one array per forecast day, in order;
+# the arrays are views into one shared buffer (for the columnar backend, the
+# store's own read-only columns).
+def get_dt_ranges(conn, *, tablename: str, forecast_days) -> list:
+    assert tablename.isidentifier()
+    days = np.asarray(forecast_days, dtype='datetime64[D]')
+    if len(days) == 0:
+        return []
+    lower = month_before(days)
+
+    # simdb's columnar backend slices its own sorted columns
+    ranges = getattr(conn, 'ranges', None)
+    if ranges is not None:
+        return ranges(lower, days, column='cnt')
+
+    query = f"select date, cnt from {tablename} where date > ? AND date <= ? order by date"
+    rows = conn.execute(query, (str(lower.min()), str(days.max()))).fetchall()
+    dates = np.array([row[0] for row in rows], dtype='datetime64[D]')
+    counts = np.array([row[1] for row in rows])
+
+    starts = np.searchsorted(dates, lower, side='right')
+    ends = np.searchsorted(dates, days, side='right')
+    return [counts[start:end] for start, end in zip(starts, ends)]
+
+
 # compute a pandas series of the forecast dates 
 # (day after forecast_day to nforecast days out)
 def get_forecast_dates(forecast_day: str, nforecast=7):
-    days = [i+1 for i in range(nforecast)]
-    deltadays = pd.to_timedelta(pd.Series(days), unit='D')
-    
-    last_day = pd.to_datetime(forecast_day)
-    dates = last_day + deltadays
-    datestr = dates.dt.date.astype(str)
-    return datestr 
\ No newline at end of file
+    datestr = pd.Series(_forecast_date_labels(forecast_day, nforecast))
+    return datestr
+
+
+# memoized on (forecast_day, nforecast): the orchestration loop asks for the
+# same few days for every series. The cached array is read-only.
+@functools.lru_cache(maxsize=4096)
+def _forecast_date_labels(forecast_day: str, nforecast: int):
+    last_day = np.datetime64(pd.to_datetime(forecast_day).date(), 'D')
+    labels = np.datetime_as_string(last_day + np.arange(1, nforecast + 1))
+    labels.setflags(write=False)
+    return labels
+
+
+# the forecast dates for many forecast days at once, as an
+# (n_days, nforecast) datetime64[D] array; np.datetime_as_string turns it
+# into the same labels get_forecast_dates returns
+def get_forecast_dates_array(forecast_days, nforecast=7):
+    days = np.asarray(forecast_days, dtype='datetime64[D]')
+    return days[:, None] + np.arange(1, nforecast + 1)
@@ -0,0 +1,36 @@
+# Makes ../models importable from the benchmark scripts.
+
+import os
+import sys
+import types
+import warnings
+
+here = os.path.dirname(os.path.abspath(__file__))
+models_dir = os.path.join(here, "..", "models")
+datafile = os.path.join(here, "..", "Notebooks-with-code", "resources", "bike_rentals.csv")
+
+sys.path.insert(0, models_dir)
+
+# `mac` ships with the Wallaroo model runtime; the models only use it for a type hint
+try:
+    import mac.types  # noqa: F401
+except ImportError:
+    _mac = types.ModuleType("mac")
+    _mac.types = types.ModuleType("mac.types")
+    _mac.types.InferenceData = dict
+    sys.modules["mac"] = _mac
+    sys.modules["mac.types"] = _mac.types
+
+import arima_numpy  # noqa: E402,F401
+import forecast_alternate01  # noqa: E402,F401
+import forecast_alternate02  # noqa: E402,F401
+import forecast_standard  # noqa: E402,F401
+
+# statsmodels forces its estimation warnings on at import and most short fits raise one
+warnings.simplefilter("ignore")
+
+forecast_modules = {
+    "forecast_standard": forecast_standard,
+    "forecast_alternate01": forecast_alternate01,
+    "forecast_alternate02": forecast_alternate02,
+}
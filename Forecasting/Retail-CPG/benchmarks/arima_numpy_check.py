@@ -0,0 +1,70 @@
+# Compare models/arima_numpy against statsmodels' ARIMA on one-month windows of
+# the bike rental data, for each order the forecast models use.
+#
+# For every window the relative difference between the two weekly averages is
+# computed; the check fails (exit status 1) when fewer than --min-share of the
+# windows are within --tolerance.
+#
+# usage: python arima_numpy_check.py [--tolerance 0.02] [--min-share 0.9] [--method mle]
+
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from statsmodels.tsa.arima.model import ARIMA
+
+from _models import arima_numpy, datafile
+
+_orders = [(1, 0, 1), (1, 1, 0), (0, 1, 1)]
+
+
+def load_windows(window=28, stride=7):
+    counts = pd.read_csv(datafile)["cnt"].to_numpy(dtype=np.float64)
+    return np.stack([counts[i:i + window] for i in range(0, len(counts) - window + 1, stride)])
+
+
+def compare(windows, order, method, n_forecast=7):
+    start = time.perf_counter()
+    reference = np.stack([ARIMA(row, order=order).fit().forecast(steps=n_forecast) for row in windows])
+    statsmodels_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    forecast, _ = arima_numpy.fit_forecast(windows, order, steps=n_forecast, method=method)
+    numpy_seconds = time.perf_counter() - start
+
+    reference_average = reference.round().mean(axis=1)
+    average = forecast.round().mean(axis=1)
+    relative = np.abs(average - reference_average) / np.maximum(np.abs(reference_average), 1.0)
+
+    return {
+        "statsmodels_seconds": statsmodels_seconds,
+        "numpy_seconds": numpy_seconds,
+        "relative": relative,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="arima_numpy vs statsmodels forecasts")
+    parser.add_argument("--tolerance", type=float, default=0.02)
+    parser.add_argument("--min-share", type=float, default=0.9)
+    parser.add_argument("--method", choices=["css", "mle"], default="mle")
+    parser.add_argument("--stride", type=int, default=7)
+    args = parser.parse_args()
+
+    windows = load_windows(stride=args.stride)
+    print(f"{len(windows)} windows of {windows.shape[1]} days, method={args.method}")
+    print(f"{'order':>10} {'statsmodels s':>14} {'numpy s':>9} {'median':>8} {'p95':>8} {'max':>8} {'within':>7}")
+
+    failed = False
+    for order in _orders:
+        result = compare(windows, order, args.method)
+        relative = result["relative"]
+        share = (relative <= args.tolerance).mean()
+        failed |= share < args.min_share
+        print(f"{str(order):>10} {result['statsmodels_seconds']:>14.3f} {result['numpy_seconds']:>9.3f} "
+              f"{np.median(relative):>8.4f} {np.quantile(relative, 0.95):>8.4f} {relative.max():>8.4f} "
+              f"{share:>7.1%}")
+
+    sys.exit(1 if failed else 0)
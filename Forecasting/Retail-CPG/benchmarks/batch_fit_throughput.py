@@ -0,0 +1,39 @@
+# Throughput of forecast_standard.process_data against batch size and worker count.
+#
+# usage: python batch_fit_throughput.py [--batch-sizes 1 64 512] [--workers 1 2 4]
+
+import argparse
+import os
+import time
+
+from _models import forecast_standard
+from synthetic import make_batch
+
+# every timed batch has to be fitted, not served from the result cache
+forecast_standard.forecast_cache.maxsize = 0
+
+
+def run(batch_sizes, worker_counts, repeats):
+    print(f"{'batch':>8} {'workers':>8} {'seconds':>10} {'series/s':>10}")
+    for batch_size in batch_sizes:
+        batch = make_batch(batch_size)
+        for workers in worker_counts:
+            # warm the pool so process start-up isn't billed to the first batch
+            forecast_standard.process_data(make_batch(workers), n_workers=workers)
+
+            best = float("inf")
+            for _ in range(repeats):
+                start = time.perf_counter()
+                forecast_standard.process_data(batch, n_workers=workers)
+                best = min(best, time.perf_counter() - start)
+            print(f"{batch_size:>8} {workers:>8} {best:>10.3f} {batch_size / best:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="forecast_standard batch throughput")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 64, 256])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    run(args.batch_sizes, sorted(set(args.workers)), args.repeats)
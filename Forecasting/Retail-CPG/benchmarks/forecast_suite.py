@@ -0,0 +1,126 @@
+# Forecast benchmark suite: runs process_data from every forecast module on
+# synthetic series and writes machine-readable JSON, so releases can be
+# compared against each other.
+#
+# For each module, estimator, series count and series length it records:
+#   - per-series latency percentiles, from one process_data call per series
+#   - batch seconds and rows/second, from one process_data call for all series
+#   - peak Python memory allocated during the batch call (tracemalloc) and
+#     the process' peak resident set size
+#
+# The result cache is turned off so every series is actually fitted.
+#
+# usage: python forecast_suite.py [--counts 10 100] [--lengths 28] [--output results.json]
+
+import argparse
+import datetime
+import json
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import statsmodels
+
+from _models import forecast_modules
+from synthetic import make_batch
+
+
+def _percentiles(seconds):
+    milliseconds = np.asarray(seconds) * 1000
+    return {
+        "mean": float(milliseconds.mean()),
+        "p50": float(np.percentile(milliseconds, 50)),
+        "p90": float(np.percentile(milliseconds, 90)),
+        "p99": float(np.percentile(milliseconds, 99)),
+        "max": float(milliseconds.max()),
+    }
+
+
+def run_case(module, estimator, n_series, length, seed, measure_memory):
+    batch = make_batch(n_series, length=length, seed=seed)
+    module.forecast_cache.maxsize = 0
+    module.forecast_cache.clear()
+
+    latencies = []
+    for row in batch["count"]:
+        start = time.perf_counter()
+        module.process_data({"count": [row]}, estimator=estimator)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    module.process_data(batch, estimator=estimator)
+    batch_seconds = time.perf_counter() - start
+
+    peak_memory = None
+    if measure_memory:
+        # traced separately, tracemalloc slows the run it watches
+        tracemalloc.start()
+        module.process_data(batch, estimator=estimator)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {
+        "module": module.__name__,
+        "estimator": estimator,
+        "n_series": n_series,
+        "length": length,
+        "latency_ms": _percentiles(latencies),
+        "batch_seconds": batch_seconds,
+        "rows_per_second": n_series / batch_seconds,
+        "peak_traced_memory_bytes": peak_memory,
+    }
+
+
+def run_suite(modules, estimators, counts, lengths, seed=0, measure_memory=True):
+    results = []
+    for name in modules:
+        for estimator in estimators:
+            for length in lengths:
+                for n_series in counts:
+                    result = run_case(forecast_modules[name], estimator, n_series, length, seed, measure_memory)
+                    print(f"{name:>22} {estimator:>12} n={n_series:<6} len={length:<4} "
+                          f"p50={result['latency_ms']['p50']:8.2f}ms "
+                          f"rows/s={result['rows_per_second']:9.1f}", file=sys.stderr)
+                    results.append(result)
+
+    return {
+        "metadata": {
+            "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "statsmodels": statsmodels.__version__,
+            "seed": seed,
+            # ru_maxrss is in kilobytes on Linux and bytes on macOS
+            "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="forecast model benchmark suite")
+    parser.add_argument("--modules", nargs="+", choices=sorted(forecast_modules), default=sorted(forecast_modules))
+    parser.add_argument("--estimators", nargs="+", choices=["statsmodels", "numpy"],
+                        default=["statsmodels", "numpy"])
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--lengths", type=int, nargs="+", default=[28])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    report = run_suite(args.modules, args.estimators, args.counts, args.lengths,
+                       seed=args.seed, measure_memory=not args.no_memory)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
@@ -0,0 +1,59 @@
+# Cost of a weekly rolling backtest over the bike rental history, fitting
+# every window from scratch versus reusing the previous window's fit.
+# forecast_rolling's default, exact refits, must match the cold fits.
+#
+# usage: python rolling_backtest.py [--model forecast_standard] [--refit-every 1 4]
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from _models import datafile, forecast_modules
+
+
+def cold_forecasts(module, counts, window, step, n_forecast=7):
+    forecasts = []
+    loglikes = []
+    for end in range(window, len(counts) + 1, step):
+        model = module._fit_model(pd.DataFrame({"count": counts[end - window:end]}))
+        forecasts.append(model.forecast(steps=n_forecast).round().to_numpy().astype(int))
+        loglikes.append(model.llf)
+    return np.array(forecasts), np.array(loglikes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="rolling backtest: cold vs warm-started fits")
+    parser.add_argument("--model", choices=sorted(forecast_modules), default="forecast_standard")
+    parser.add_argument("--refit-every", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--window", type=int, default=28)
+    parser.add_argument("--step", type=int, default=7)
+    args = parser.parse_args()
+
+    module = forecast_modules[args.model]
+    counts = pd.read_csv(datafile)["cnt"].to_numpy()
+
+    start = time.perf_counter()
+    cold, cold_llf = cold_forecasts(module, counts, args.window, args.step)
+    cold_seconds = time.perf_counter() - start
+
+    print(f"{args.model}: {len(cold)} windows of {args.window} days, step {args.step}")
+    # avg diff: mean absolute gap between weekly averages and the cold fits';
+    # llf diff: mean log likelihood gap, negative when the fits are worse.  The
+    # MA terms of these short windows often sit near -1 where the likelihood is
+    # flat, so equally good fits can still forecast differently.
+    print(f"{'mode':>16} {'seconds':>9} {'speedup':>8} {'avg diff':>9} {'llf diff':>9}")
+    print(f"{'cold':>16} {cold_seconds:>9.3f} {1.0:>8.2f} {0.0:>9.2f} {0.0:>9.3f}")
+
+    exact = module.forecast_rolling(counts, window=args.window, step=args.step)
+    assert np.array_equal(exact["forecast"], cold), "exact refits disagree with the cold fits"
+
+    for refit_every in args.refit_every:
+        start = time.perf_counter()
+        result = module.forecast_rolling(counts, window=args.window, step=args.step, refit_every=refit_every)
+        seconds = time.perf_counter() - start
+        diff = np.abs(result["weekly_average"] - cold.mean(axis=1)).mean()
+        llf_diff = (result["llf"] - cold_llf).mean()
+        print(f"{'refit_every=' + str(refit_every):>16} {seconds:>9.3f} {cold_seconds / seconds:>8.2f} "
+              f"{diff:>9.2f} {llf_diff:>9.3f}")
@@ -0,0 +1,98 @@
+# Query cost of simdb's backends on the bike rental data: sqlite in memory,
+# the persistent sqlite file, and the columnar in-memory store.
+#
+# For each backend it times opening a connection, answering one month's
+# window per forecast day with util's queries, and the bulk
+# util.get_dt_ranges call; the columnar store's own window slices are timed
+# too. Every backend must return the same counts.
+#
+# usage: python simdb_backends.py [--days 100] [--repeat 5]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from _models import datafile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Notebooks-with-code"))
+
+from resources import simdb, util  # noqa: E402
+
+tablename = simdb.tablename
+
+
+def _best(f, repeat):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = f()
+        seconds.append(time.perf_counter() - start)
+    return min(seconds), result
+
+
+def forecast_days(n_days):
+    first = np.datetime64("2011-02-01")
+    last = np.datetime64("2012-12-31")
+    return [str(day) for day in first + np.linspace(0, (last - first).astype(int), n_days).astype(int)]
+
+
+def run_backend(connect, days, repeat):
+    open_seconds, conn = _best(connect, repeat)
+    query = util.mk_dt_range_query_params(tablename=tablename)
+
+    def per_day():
+        return [np.array([row[0] for row in conn.execute(query, (day, day)).fetchall()]) for day in days]
+
+    def bulk():
+        return util.get_dt_ranges(conn, tablename=tablename, forecast_days=days)
+
+    query_seconds, windows = _best(per_day, repeat)
+    bulk_seconds, bulk_windows = _best(bulk, repeat)
+    return open_seconds, query_seconds, bulk_seconds, windows, bulk_windows, conn
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="simdb backends: sqlite vs the columnar store")
+    parser.add_argument("--days", type=int, default=100, help="forecast days to query")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement; the fastest is reported")
+    args = parser.parse_args()
+
+    days = forecast_days(args.days)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        dbfile = os.path.join(tmpdir, "bikerentals.db")
+        simdb.get_db_connection(datafile, dbfile=dbfile).close()
+
+        def columnar_cold():
+            simdb._stores.clear()
+            return simdb.get_db_connection(datafile, backend="columnar")
+
+        backends = {
+            "sqlite memory": lambda: simdb.get_db_connection(datafile),
+            "sqlite file": lambda: simdb.get_db_connection(datafile, dbfile=dbfile),
+            "columnar": columnar_cold,
+            "columnar cached": lambda: simdb.get_db_connection(datafile, backend="columnar"),
+        }
+
+        print(f"{len(days)} forecast days, best of {args.repeat}")
+        print(f"{'backend':>16} {'open ms':>9} {'per-day ms':>11} {'bulk ms':>9} {'windows/s':>11}")
+        reference = None
+        for name, connect in backends.items():
+            open_seconds, query_seconds, bulk_seconds, windows, bulk_windows, conn = run_backend(
+                connect, days, args.repeat)
+            if reference is None:
+                reference = windows
+            for got in (windows, bulk_windows):
+                assert all(np.array_equal(a, b) for a, b in zip(reference, got)), f"{name} disagrees with sqlite"
+            print(f"{name:>16} {open_seconds * 1000:>9.3f} {query_seconds * 1000:>11.3f} "
+                  f"{bulk_seconds * 1000:>9.3f} {len(days) / bulk_seconds:>11.0f}")
+
+        store = simdb.get_db_connection(datafile, backend="columnar")
+        window_seconds, windows = _best(lambda: [store.window(day) for day in days], args.repeat)
+        assert all(np.array_equal(a, b) for a, b in zip(reference, windows))
+        print(f"{'columnar window':>16} {'':>9} {window_seconds * 1000:>11.3f} {'':>9} "
+              f"{len(days) / window_seconds:>11.0f}")
@@ -0,0 +1,38 @@
+# Synthetic daily rental counts shaped like the bike rental data: a per-series
+# level and trend, a weekly cycle, autocorrelated noise and the occasional
+# bad-weather day.
+
+import numpy as np
+
+
+def make_series(n_series, length=28, seed=0):
+    """
+    Return an (n_series, length) int array of non-negative daily counts.
+    """
+    rng = np.random.default_rng(seed)
+    days = np.arange(length)
+
+    level = rng.uniform(1000, 6000, size=(n_series, 1))
+    trend = rng.normal(0, 15, size=(n_series, 1)) * days
+    phase = rng.uniform(0, 2 * np.pi, size=(n_series, 1))
+    weekly = rng.uniform(100, 600, size=(n_series, 1)) * np.sin(2 * np.pi * days / 7 + phase)
+
+    # AR(1) noise so the series have the day-to-day persistence of real counts
+    shocks = rng.normal(0, 1, size=(n_series, length)) * rng.uniform(150, 500, size=(n_series, 1))
+    noise = np.empty_like(shocks)
+    noise[:, 0] = shocks[:, 0]
+    for t in range(1, length):
+        noise[:, t] = 0.5 * noise[:, t - 1] + shocks[:, t]
+
+    # about one day in twenty loses most of its riders
+    storms = rng.random((n_series, length)) < 0.05
+    counts = (level + trend + weekly + noise) * np.where(storms, rng.uniform(0.2, 0.6, size=storms.shape), 1.0)
+
+    return np.clip(counts, 0, None).round().astype(int)
+
+
+def make_batch(n_series, length=28, seed=0):
+    """
+    The same series as the `count` input process_data expects.
+    """
+    return {"count": make_series(n_series, length=length, seed=seed)}
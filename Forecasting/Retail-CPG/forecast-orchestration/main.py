@@ -1,6 +1,14 @@
 import wallaroo
 from wallaroo.object import EntityNotFoundError
 
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
 
 wl = wallaroo.Client()
 
@@ -17,6 +25,93 @@ if "pipeline_name" in arguments:
 else:
     pipeline_name="bikedaypipe"
 
+# mode "async" sends every window in windows_file (a records file with one
+# {"count": [...]} window per store) as its own inference, at most
+# max_concurrency at a time; each attempt is given timeout seconds and a
+# failed window is retried up to retries times
+#
+# The timeout is pipeline.infer's own request timeout, which ends the call.
+# A thread cannot be cancelled, so the asyncio wait is only a backstop, a
+# little longer than the request timeout; an attempt it gives up on keeps
+# its thread until the request times out, and the executor has a thread for
+# every attempt that can be outstanding so retries never queue behind it.
+if "mode" in arguments:
+    mode = arguments['mode']
+else:
+    mode = "single"
+
+if "windows_file" in arguments:
+    windows_file = arguments['windows_file']
+else:
+    windows_file = './data/testdata-standard.df.json'
+
+if "max_concurrency" in arguments:
+    max_concurrency = int(arguments['max_concurrency'])
+else:
+    max_concurrency = 8
+
+if "timeout" in arguments:
+    timeout = float(arguments['timeout'])
+else:
+    timeout = 15.0
+
+if "retries" in arguments:
+    retries = int(arguments['retries'])
+else:
+    retries = 2
+
+# seconds past the request timeout before an attempt is abandoned
+backstop_seconds = 5.0
+
+# infer one window, retrying with exponential backoff; returns the window's
+# index, the result or the last error, the seconds from first attempt to
+# finish, and the number of attempts
+async def infer_window(pipeline, i, window, semaphore, executor, timeout, retries):
+    loop = asyncio.get_running_loop()
+    async with semaphore:
+        start = time.perf_counter()
+        for attempt in range(retries + 1):
+            try:
+                call = functools.partial(pipeline.infer, window, timeout=timeout)
+                result = await asyncio.wait_for(loop.run_in_executor(executor, call), timeout + backstop_seconds)
+                return i, result, time.perf_counter() - start, attempt + 1
+            except Exception as e:
+                error = e
+                if attempt < retries:
+                    await asyncio.sleep(0.1 * 2 ** attempt)
+        return i, error, time.perf_counter() - start, retries + 1
+
+# infer every window concurrently and collect the results as they complete;
+# the results are returned in window order, failures as the exception
+async def infer_windows(pipeline, windows, max_concurrency, timeout, retries):
+    semaphore = asyncio.Semaphore(max_concurrency)
+    results = [None] * len(windows)
+    latencies = np.empty(len(windows))
+    attempts = np.empty(len(windows), dtype=int)
+
+    # pipeline.infer blocks, so each call runs on its own thread; every window
+    # in flight can have an abandoned attempt per retry still running beside
+    # its current one
+    with ThreadPoolExecutor(max_workers=max_concurrency * (retries + 1)) as executor:
+        tasks = [infer_window(pipeline, i, window, semaphore, executor, timeout, retries)
+                 for i, window in enumerate(windows)]
+        for task in asyncio.as_completed(tasks):
+            i, result, seconds, tries = await task
+            results[i] = result
+            latencies[i] = seconds
+            attempts[i] = tries
+    return results, latencies, attempts
+
+def report(results, latencies, attempts, seconds):
+    failed = sum(isinstance(result, Exception) for result in results)
+    print(f"Windows: {len(results)}  failed: {failed}  retried: {int((attempts > 1).sum())}")
+    print(f"Attempts: {int(attempts.sum())}  retries: {int(attempts.sum()) - len(results)}")
+    print(f"Seconds: {seconds:.2f}  windows/s: {len(results) / seconds:.1f}  "
+          f"attempts/s: {attempts.sum() / seconds:.1f}")
+    if len(latencies) > 0:
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+        print(f"Latency ms  p50: {p50:.1f}  p95: {p95:.1f}  p99: {p99:.1f}  max: {latencies.max() * 1000:.1f}")
+
 print(f"Workspace: {workspace_name}")
 workspace = wl.get_workspace(workspace_name)
 
@@ -30,6 +125,22 @@ print(pipeline)
 
 print(pipeline.status())
 
-single_result = pipeline.infer_from_file('./data/testdata-standard.df.json')
+if mode == "async":
+    windows_df = pd.read_json(windows_file, orient="records")
+    windows = [windows_df.iloc[i:i + 1].reset_index(drop=True) for i in range(len(windows_df))]
+
+    start = time.perf_counter()
+    results, latencies, attempts = asyncio.run(infer_windows(pipeline, windows, max_concurrency, timeout, retries))
+    seconds = time.perf_counter() - start
+
+    for i, result in enumerate(results):
+        if isinstance(result, Exception):
+            print(f"Window {i} failed: {result!r}")
+    succeeded = [result.assign(window=i) for i, result in enumerate(results) if not isinstance(result, Exception)]
+    if succeeded:
+        print(pd.concat(succeeded, ignore_index=True))
+    report(results, latencies, attempts, seconds)
+else:
+    single_result = pipeline.infer_from_file('./data/testdata-standard.df.json')
 
-print(single_result)
+    print(single_result)
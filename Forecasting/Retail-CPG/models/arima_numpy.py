@@ -0,0 +1,352 @@
+# Vectorized estimates for the small, fixed ARIMA orders used by the forecast
+# models: (1, 0, 1), (1, 1, 0) and (0, 1, 1).
+#
+# All series of the same length are stacked into one 2-D array and fitted
+# together, so a batch costs a few hundred NumPy passes over the data instead
+# of one statsmodels state-space fit per row.  Conditional least squares (CSS)
+# gives the starting values; method="mle" then maximizes the same Gaussian
+# likelihood statsmodels' ARIMA uses, evaluated with a vectorized Kalman
+# filter over the same state-space form, so the forecasts line up with the
+# statsmodels ones.
+#
+# Parameters are returned per row as [mean, phi, theta, sigma2], dropping the
+# terms an order doesn't use; like statsmodels, a mean is only estimated when
+# d == 0.
+
+import numpy as np
+
+_supported_orders = {(1, 0, 1), (1, 1, 0), (0, 1, 1)}
+
+# statsmodels starts the undifferenced level of a d == 1 model from an
+# approximate diffuse prior with this variance, and drops the first
+# observation from the likelihood
+_diffuse_variance = 1e6
+
+
+def _check_order(order):
+    order = tuple(order)
+    if order not in _supported_orders:
+        raise ValueError(f"order {order} is not supported, expected one of {sorted(_supported_orders)}")
+    return order
+
+
+def _split_params(params, order):
+    p, d, q = order
+    n = params.shape[0]
+    col = 0
+    mean = np.zeros(n)
+    if d == 0:
+        mean = params[:, col]
+        col += 1
+    phi = params[:, col] if p else np.zeros(n)
+    col += p
+    theta = params[:, col] if q else np.zeros(n)
+    col += q
+    sigma2 = params[:, col] if params.shape[1] > col else np.ones(n)
+    return mean, phi, theta, sigma2
+
+
+# The optimizer works on an unconstrained vector z: the mean is standardized
+# per row, the coefficients go through statsmodels' x / sqrt(1 + x^2) so the
+# fit stays stationary and invertible, and sigma2 is optimized on a log scale.
+def _to_params(z, order, center, scale):
+    params = np.empty_like(z)
+    col = 0
+    if order[1] == 0:
+        params[:, 0] = center + scale * z[:, 0]
+        col = 1
+    n_coef = order[0] + order[2]
+    coef = z[:, col:col + n_coef]
+    params[:, col:col + n_coef] = coef / np.sqrt(1.0 + coef ** 2)
+    col += n_coef
+    if z.shape[1] > col:
+        params[:, col] = scale ** 2 * np.exp(z[:, col])
+    return params
+
+
+def _to_z(params, order, center, scale):
+    z = np.empty_like(params)
+    col = 0
+    if order[1] == 0:
+        z[:, 0] = (params[:, 0] - center) / scale
+        col = 1
+    n_coef = order[0] + order[2]
+    coef = np.clip(params[:, col:col + n_coef], -0.9999, 0.9999)
+    z[:, col:col + n_coef] = coef / np.sqrt(1.0 - coef ** 2)
+    col += n_coef
+    if params.shape[1] > col:
+        z[:, col] = np.log(np.maximum(params[:, col], 1e-12) / scale ** 2)
+    return z
+
+
+def _css_residuals(y, params, order):
+    mean, phi, theta, _ = _split_params(params, order)
+    x = y - mean[:, None]
+    p = order[0]
+    e = np.empty((y.shape[0], y.shape[1] - p))
+    e_prev = np.zeros(y.shape[0])
+    for i in range(e.shape[1]):
+        t = i + p
+        x_lag = x[:, t - 1] if p else 0.0
+        e_prev = x[:, t] - phi * x_lag - theta * e_prev
+        e[:, i] = e_prev
+    return e
+
+
+# The ARMA part is x_t = phi x_{t-1} + e_t + theta e_{t-1}, carried as the
+# state [x_t, theta e_t] started from its stationary distribution.  For d == 1
+# the previous level is prepended to the state as statsmodels does, giving
+# [y_{t-1}, x_t, theta e_t] with y_t = y_{t-1} + x_t; for d == 0 that slot is
+# simply unused.  The transition is sparse enough that the filter is written
+# out per covariance element, which keeps every step a handful of operations
+# on (n,) arrays instead of batched small-matrix products.
+def _kalman(counts, params, order):
+    """
+    Run the Kalman filter over the rows of counts.
+
+    Returns the log likelihood of each row and the predicted [level, x]
+    state after the last observation.
+    """
+    mean, phi, theta, sigma2 = _split_params(params, order)
+    x = counts - mean[:, None]
+    n, length = x.shape
+    d = float(order[1])
+    burn = order[1]
+
+    # stationary covariance of [x_t, theta e_t]
+    p_xx = sigma2 * (1.0 + 2.0 * phi * theta + theta ** 2) / (1.0 - phi ** 2)
+    p_xm = sigma2 * theta
+    p_mm = sigma2 * theta ** 2
+    p_ll = np.full(n, d * _diffuse_variance)
+    p_lx = np.zeros(n)
+    p_lm = np.zeros(n)
+
+    a_l = np.zeros(n)
+    a_x = np.zeros(n)
+    loglike = np.zeros(n)
+    for t in range(length):
+        v = x[:, t] - d * a_l - a_x
+        g_l = d * p_ll + p_lx
+        g_x = d * p_lx + p_xx
+        g_m = d * p_lm + p_xm
+        F = np.maximum(d * g_l + g_x, 1e-12)
+        k_l = d * (g_l + g_x) / F
+        k_x = (phi * g_x + g_m) / F
+
+        a_l, a_x = d * (a_l + a_x) + k_l * v, phi * a_x + k_x * v
+
+        p_ll, p_lx = (d * (p_ll + 2.0 * p_lx + p_xx) - F * k_l ** 2,
+                      d * (phi * (p_lx + p_xx) + p_lm + p_xm) - F * k_l * k_x)
+        p_xx = phi ** 2 * p_xx + 2.0 * phi * p_xm + p_mm + sigma2 - F * k_x ** 2
+        # the theta e_t slot is fresh noise every step
+        p_lm = np.zeros(n)
+        p_xm = sigma2 * theta
+        p_mm = sigma2 * theta ** 2
+
+        if t >= burn:
+            loglike -= 0.5 * (np.log(2 * np.pi) + np.log(F) + v ** 2 / F)
+
+    return loglike, a_l, a_x
+
+
+# Batched Newton minimization with central-difference derivatives.
+# objective(z, rows) evaluates the given rows only, so rows that have
+# converged drop out of later iterations.  The Hessian's eigenvalues are made
+# positive so every step is a descent direction, and each row keeps the first
+# halved step that lowers its own objective.
+def _minimize(objective, z, max_iter, tol):
+    z = z.copy()
+    k = z.shape[1]
+    h = 1e-4
+    eye = np.eye(k) * h
+
+    active = np.arange(len(z))
+    f = objective(z, active)
+    for _ in range(max_iter):
+        za = z[active]
+        f_plus = np.stack([objective(za + eye[i], active) for i in range(k)], axis=1)
+        f_minus = np.stack([objective(za - eye[i], active) for i in range(k)], axis=1)
+        grad = (f_plus - f_minus) / (2 * h)
+
+        hess = np.empty((len(active), k, k))
+        for i in range(k):
+            hess[:, i, i] = (f_plus[:, i] - 2 * f + f_minus[:, i]) / h ** 2
+            for j in range(i + 1, k):
+                cross = (objective(za + eye[i] + eye[j], active) - objective(za + eye[i] - eye[j], active)
+                         - objective(za - eye[i] + eye[j], active)
+                         + objective(za - eye[i] - eye[j], active)) / (4 * h ** 2)
+                hess[:, i, j] = hess[:, j, i] = cross
+
+        w, V = np.linalg.eigh(hess)
+        w = np.maximum(np.abs(w), 1e-6)
+        step = -np.einsum("nij,nj->ni", V, np.einsum("nji,nj->ni", V, grad) / w)
+        # keep a single step from jumping across the whole parameter space
+        step *= np.minimum(1.0, 2.0 / np.maximum(np.abs(step).max(axis=1), 1e-12))[:, None]
+
+        accepted = np.zeros(len(active), dtype=bool)
+        new_z = za.copy()
+        new_f = f.copy()
+        alpha = 1.0
+        for _ in range(10):
+            candidate = za + alpha * step
+            f_c = objective(candidate, active)
+            better = ~accepted & (f_c < f)
+            new_z[better] = candidate[better]
+            new_f[better] = f_c[better]
+            accepted |= better
+            if accepted.all():
+                break
+            alpha /= 2
+
+        z[active] = new_z
+        # near the stationarity bounds z can keep growing without the fit
+        # changing, so a row also stops once its objective stops improving
+        moving = (accepted & (np.abs(new_z - za).max(axis=1) >= tol)
+                  & (f - new_f > tol * (1.0 + np.abs(f))))
+        active, f = active[moving], new_f[moving]
+        if not len(active):
+            break
+
+    return z
+
+
+def _initial_params(y, order, center, scale):
+    p, d, q = order
+    n = y.shape[0]
+    columns = []
+
+    if d == 0:
+        columns.append(center)
+    if p:
+        centered = y - center[:, None]
+        denom = (centered[:, :-1] ** 2).sum(axis=1)
+        phi = np.divide((centered[:, 1:] * centered[:, :-1]).sum(axis=1), denom,
+                        out=np.zeros(n), where=denom > 0)
+        columns.append(np.clip(phi, -0.9, 0.9))
+    if q:
+        columns.append(np.zeros(n))
+    columns.append(scale ** 2)
+
+    return np.column_stack(columns)
+
+
+def _fit_css(y, params, order, center, scale, max_iter, tol):
+    # sigma2 isn't part of the CSS objective, it's the residual variance afterwards
+    z = _to_z(params[:, :-1], order, center, scale)
+    z = _minimize(lambda z, rows: (_css_residuals(y[rows], _to_params(z, order, center[rows], scale[rows]),
+                                                  order) ** 2).sum(axis=1),
+                  z, max_iter, tol)
+
+    params = _to_params(z, order, center, scale)
+    sigma2 = (_css_residuals(y, params, order) ** 2).mean(axis=1)
+    return np.column_stack([params, sigma2])
+
+
+def _fit_mle(counts, params, order, center, scale, max_iter, tol):
+    z = _to_z(params, order, center, scale)
+    z = _minimize(lambda z, rows: -_kalman(counts[rows], _to_params(z, order, center[rows], scale[rows]),
+                                           order)[0],
+                  z, max_iter, tol)
+    return _to_params(z, order, center, scale)
+
+
+def difference(counts, d):
+    counts = np.asarray(counts, dtype=np.float64)
+    return np.diff(counts, n=d, axis=1) if d else counts
+
+
+def fit(counts, order, method="mle", start_params=None, differenced=None, max_iter=20, tol=1e-6):
+    """
+    Fit every row of the 2-D array counts (undifferenced).
+
+    method is "css" for conditional least squares or "mle" for the exact
+    likelihood. start_params, in the layout fit returns, replaces the default
+    starting values. differenced, when given, is difference(counts, d) computed
+    by the caller so several orders with the same d can share it.
+    Returns the (n, k) array of [mean, phi, theta, sigma2].
+    """
+    order = _check_order(order)
+    if method not in ("css", "mle"):
+        raise ValueError(f"method must be 'css' or 'mle', got {method!r}")
+    counts = np.asarray(counts, dtype=np.float64)
+    y = difference(counts, order[1]) if differenced is None else differenced
+    n = counts.shape[0]
+
+    center = y.mean(axis=1)
+    scale = np.maximum(y.std(axis=1), 1e-8)
+
+    if start_params is not None:
+        params = np.array(start_params, dtype=np.float64, ndmin=2)
+        params = np.broadcast_to(params, (n, params.shape[1])).copy()
+        if method == "css":
+            return _fit_css(y, params, order, center, scale, max_iter, tol)
+        return _fit_mle(counts, params, order, center, scale, max_iter, tol)
+
+    initial = _initial_params(y, order, center, scale)
+    css = _fit_css(y, initial, order, center, scale, max_iter, tol)
+    if method == "css":
+        return css
+
+    # The likelihood of these short series often has a second mode with the MA
+    # coefficient near -1, and CSS estimates tend to start next to it.  Both
+    # the CSS and the plain starting values are optimized as one stacked batch
+    # and each row keeps whichever ends with the higher likelihood.
+    starts = np.concatenate([css, initial])
+    stacked = _fit_mle(np.concatenate([counts, counts]), starts, order,
+                       np.concatenate([center, center]), np.concatenate([scale, scale]),
+                       max_iter, tol)
+    loglike = _kalman(np.concatenate([counts, counts]), stacked, order)[0]
+    use_css = loglike[:n] >= loglike[n:]
+    return np.where(use_css[:, None], stacked[:n], stacked[n:])
+
+
+def forecast_from_params(counts, params, order, steps=7):
+    """
+    Forecast `steps` values past the end of each row of counts (n, T).
+    """
+    order = _check_order(order)
+    counts = np.asarray(counts, dtype=np.float64)
+    mean, phi, _, _ = _split_params(params, order)
+    d = float(order[1])
+
+    _, a_l, a_x = _kalman(counts, params, order)
+    forecast = np.empty((counts.shape[0], steps))
+    for h in range(steps):
+        forecast[:, h] = d * a_l + a_x + mean
+        a_l, a_x = d * (a_l + a_x), phi * a_x
+    return forecast
+
+
+def fit_forecast(counts, order, steps=7, method="mle", start_params=None, differenced=None):
+    """
+    Fit and forecast every row of the 2-D array counts in one pass.
+
+    Returns (forecast, params) where forecast is (n, steps).
+    """
+    params = fit(counts, order, method=method, start_params=start_params, differenced=differenced)
+    return forecast_from_params(counts, params, order, steps=steps), params
+
+
+def forecast_rows(rows, order, steps=7, method="mle"):
+    """
+    Fit and forecast a list of series that may have different lengths.
+    Rows of equal length are fitted together; the results keep the input order.
+
+    Returns (forecast, params) with forecast (n, steps) and params (n, k).
+    """
+    order = _check_order(order)
+    rows = [np.asarray(row, dtype=np.float64) for row in rows]
+    forecast = np.empty((len(rows), steps))
+    params = np.empty((len(rows), (order[1] == 0) + order[0] + order[2] + 1))
+
+    by_length = {}
+    for i, row in enumerate(rows):
+        by_length.setdefault(len(row), []).append(i)
+
+    for indexes in by_length.values():
+        batch_forecast, batch_params = fit_forecast(np.stack([rows[i] for i in indexes]), order,
+                                                    steps=steps, method=method)
+        forecast[indexes] = batch_forecast
+        params[indexes] = batch_params
+
+    return forecast, params
@@ -0,0 +1,168 @@
+# Evaluate every forecast variant on the same batch in one pass, for A/B and
+# shadow comparisons of forecast_standard, forecast_alternate01 and
+# forecast_alternate02.
+#
+# The input is prepared once and shared by all variants: the rows are
+# stacked by length, with the differences the vectorized estimator needs
+# (alternate01 and alternate02 are both d == 1, so they share one
+# differenced array), and written to one temporary file that every worker
+# maps read-only.  A task only carries the file's path and layout, so the
+# data is neither pickled nor copied per variant; the statsmodels fits build
+# their per-row DataFrames in the worker.  The variants run concurrently,
+# one per process of a pool that is kept between calls: both estimators
+# spend much of their time in Python code that holds the GIL.
+
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import arima_numpy
+import forecast_alternate01
+import forecast_alternate02
+import forecast_standard
+
+variants = {
+    "forecast_standard": forecast_standard,
+    "forecast_alternate01": forecast_alternate01,
+    "forecast_alternate02": forecast_alternate02,
+}
+
+_pool = None
+
+
+# one process per variant, started by the first evaluation and reused after
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=len(variants))
+    return _pool
+
+
+# rows of equal length stacked once, as (indexes, arrays) per length: arrays
+# holds the stacked "counts" and, keyed by d, their d-th differences
+def _prepare(rows, ds):
+    by_length = {}
+    for i, row in enumerate(rows):
+        by_length.setdefault(len(row), []).append(i)
+
+    groups = []
+    for indexes in by_length.values():
+        counts = np.stack([rows[i] for i in indexes])
+        arrays = {"counts": counts}
+        arrays.update((d, arima_numpy.difference(counts, d)) for d in ds)
+        groups.append((indexes, arrays))
+    return groups
+
+
+# write the groups' arrays one after another to path; the layout replaces
+# each array with its offset and shape in the file
+def _write_shared(groups, path):
+    layout = []
+    offset = 0
+    with open(path, "wb") as f:
+        for indexes, arrays in groups:
+            entries = {}
+            for key, array in arrays.items():
+                array = np.ascontiguousarray(array, dtype=np.float64)
+                array.tofile(f)
+                entries[key] = (offset, array.shape)
+                offset += array.nbytes
+            layout.append((indexes, entries))
+    return layout
+
+
+# the groups written by _write_shared, as read-only views of the file
+def _read_shared(path, layout):
+    return [(indexes, {key: _map(path, offset, shape) for key, (offset, shape) in entries.items()})
+            for indexes, entries in layout]
+
+
+def _map(path, offset, shape):
+    # mmap cannot map zero bytes
+    if 0 in shape:
+        return np.empty(shape)
+    return np.memmap(path, dtype=np.float64, mode="r", offset=offset, shape=shape)
+
+
+def _run_numpy(name, path, layout, n_rows, n_forecast):
+    order = variants[name]._order
+    start = time.perf_counter()
+    forecast = np.empty((n_rows, n_forecast))
+    for indexes, arrays in _read_shared(path, layout):
+        forecast[indexes], _ = arima_numpy.fit_forecast(arrays["counts"], order, steps=n_forecast,
+                                                        differenced=arrays[order[1]])
+    return forecast, time.perf_counter() - start
+
+
+def _run_statsmodels(name, path, layout, n_rows, n_forecast):
+    fit_model = variants[name]._fit_model
+    start = time.perf_counter()
+    forecast = np.empty((n_rows, n_forecast))
+    for indexes, arrays in _read_shared(path, layout):
+        for i, row in zip(indexes, arrays["counts"]):
+            frame = pd.DataFrame({"count": np.array(row)})
+            forecast[i] = fit_model(frame).forecast(steps=n_forecast).to_numpy()
+    return forecast, time.perf_counter() - start
+
+
+def evaluate(input_data, variant_names=None, estimator="numpy", n_forecast=7):
+    """
+    Fit every variant on input_data["count"].
+
+    Returns (results, timing): results maps each variant name to a DataFrame
+    with the forecast and weekly_average of every input row, in input order;
+    timing has one row per variant with its order, fit seconds and series per
+    second, plus the shared preparation and the wall-clock total.
+    """
+    names = list(variant_names or variants)
+    unknown = [name for name in names if name not in variants]
+    if unknown:
+        raise ValueError(f"unknown variants {unknown}, expected some of {list(variants)}")
+
+    start = time.perf_counter()
+    rows = [np.asarray(row, dtype=np.float64) for row in input_data["count"]]
+
+    if estimator == "numpy":
+        groups = _prepare(rows, {variants[name]._order[1] for name in names})
+        run = _run_numpy
+    elif estimator == "statsmodels":
+        groups = _prepare(rows, ())
+        run = _run_statsmodels
+    else:
+        raise ValueError(f"estimator must be 'numpy' or 'statsmodels', got {estimator!r}")
+
+    fd, path = tempfile.mkstemp(prefix="evaluate-", suffix=".bin")
+    os.close(fd)
+    try:
+        layout = _write_shared(groups, path)
+        prepare_seconds = time.perf_counter() - start
+
+        executor = _get_pool()
+        futures = {name: executor.submit(run, name, path, layout, len(rows), n_forecast) for name in names}
+        outputs = {name: future.result() for name, future in futures.items()}
+    finally:
+        os.remove(path)
+    total_seconds = time.perf_counter() - start
+
+    results = {}
+    timing = []
+    for name, (forecast, seconds) in outputs.items():
+        forecast = forecast.round().astype(int)
+        results[name] = pd.DataFrame({
+            "forecast": list(forecast),
+            "weekly_average": forecast.mean(axis=1),
+        })
+        timing.append({
+            "variant": name,
+            "order": variants[name]._order,
+            "seconds": seconds,
+            "series_per_second": len(rows) / seconds if seconds else float("inf"),
+        })
+    timing.append({"variant": "prepare", "order": None, "seconds": prepare_seconds, "series_per_second": None})
+    timing.append({"variant": "total", "order": None, "seconds": total_seconds, "series_per_second": None})
+
+    return results, pd.DataFrame(timing)
@@ -0,0 +1,108 @@
+# LRU cache of fitted forecasts keyed by the content of the input series.
+#
+# Edge deployments see the same `count` window forecast over and over; the
+# fit is deterministic, so a repeated window can reuse the earlier result and
+# skip the ARIMA fit entirely.  Entries hold the forecast, the weekly average
+# and the fitted parameters.
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def series_key(row, *extra):
+    """
+    Key a series by its values plus anything else that changes the fit,
+    such as the model order and the number of forecast steps.
+    """
+    values = np.ascontiguousarray(row, dtype=np.float64)
+    digest = hashlib.blake2b(values.tobytes(), digest_size=16)
+    digest.update(repr(extra).encode())
+    return digest.hexdigest()
+
+
+class ForecastCache:
+    """
+    Thread-safe LRU cache bounded by entry count, with an optional TTL in
+    seconds. maxsize=0 disables caching.
+    """
+
+    def __init__(self, maxsize=4096, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored, value = entry
+                if self.ttl is None or time.monotonic() - stored <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.evictions += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def cached_map(cache, rows, keys, compute):
+    """
+    Look every row up by its key and call compute() once with the rows that
+    missed; compute returns one value per row it was given. Results come back
+    in the order of rows, and a key repeated within the batch is fitted once.
+    """
+    results = [None] * len(rows)
+    missing = {}
+    for i, key in enumerate(keys):
+        value = cache.get(key)
+        if value is not None:
+            results[i] = value
+        else:
+            missing.setdefault(key, []).append(i)
+
+    if missing:
+        computed = compute([rows[indexes[0]] for indexes in missing.values()])
+        for (key, indexes), value in zip(missing.items(), computed):
+            cache.put(key, value)
+            for i in indexes:
+                results[i] = value
+
+    return results
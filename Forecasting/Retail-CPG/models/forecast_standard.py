@@ -1,38 +1,127 @@
 import numpy as np
 import pandas as pd
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from mac.types import InferenceData
 
 from statsmodels.tsa.arima.model import ARIMA
 
+import arima_numpy
+import fit_cache
+import rolling
+
 #logger = logging.getLogger(__name__)
 
+_order = (1, 0, 1)
+
+# "statsmodels" fits each series with statsmodels' ARIMA; "numpy" fits the
+# whole batch at once with the vectorized estimator in arima_numpy
+default_estimator = "statsmodels"
+
+# repeated input windows reuse the earlier fit; forecast_cache.stats() reports
+# hits and misses, and maxsize=0 turns caching off
+forecast_cache = fit_cache.ForecastCache(maxsize=4096, ttl=24 * 60 * 60)
+
+# number of worker processes used to fit a batch; 1 fits every series in-process
+default_n_workers = 1
+
+# series handed to a worker per task; None picks a chunk size from the batch size
+default_chunksize = None
+
+_pool = None
+_pool_workers = 0
+
 
-def _fit_model(dataframe):
-    model = ARIMA(dataframe["count"], order=(1, 0, 1)).fit()
+# start_params, usually the previous window's model.params, warm-starts the fit
+def _fit_model(dataframe, start_params=None):
+    model = ARIMA(dataframe["count"], order=_order).fit(start_params=start_params)
     return model
 
 
-def process_data(input_data: InferenceData) -> InferenceData:
-    n_forecast = 7
-    forecasts = []
-    weekly_averages = []
+def _forecast_row(row, n_forecast):
+    evaluation_frame = pd.DataFrame({"count": row})
+    model = _fit_model(evaluation_frame)
+
+    # get a numpy array
+    forecast = model.forecast(steps=n_forecast).round().to_numpy()
+    forecast = forecast.astype(int)
+
+    # get the average across the week
+    weekly_average = forecast.mean()
+
+    return forecast, weekly_average, np.asarray(model.params)
+
+
+def _forecast_chunk(rows, n_forecast):
+    return [_forecast_row(row, n_forecast) for row in rows]
 
-    for row in input_data["count"]:
-        evaluation_frame = pd.DataFrame({"count": row})
-        model = _fit_model(evaluation_frame)
 
-        # get a numpy array
-        forecast = model.forecast(steps=n_forecast).round().to_numpy()
-        forecast = forecast.astype(int)
+# the pool is kept between calls so a deployment only pays the process start-up once
+def _get_pool(workers):
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = ProcessPoolExecutor(max_workers=workers)
+        _pool_workers = workers
+    return _pool
 
-        # get the average across the week
-        weekly_average = forecast.mean()
 
-        forecasts.append(forecast)
-        weekly_averages.append(weekly_average)
+def _split(rows, size):
+    return [rows[i:i + size] for i in range(0, len(rows), size)]
+
+
+def _forecast_numpy(rows, n_forecast):
+    forecast, params = arima_numpy.forecast_rows(rows, _order, steps=n_forecast)
+    forecast = forecast.round().astype(int)
+    return list(zip(forecast, forecast.mean(axis=1), params))
+
+
+def _forecast_statsmodels(rows, n_forecast, workers, size):
+    if workers <= 1 or len(rows) <= 1:
+        return [_forecast_row(row, n_forecast) for row in rows]
+
+    # a few chunks per worker keeps the pool busy when fit times vary
+    if size is None:
+        size = max(1, -(-len(rows) // (workers * 4)))
+    chunks = _split(rows, size)
+    pool = _get_pool(workers)
+    # map preserves the input order, so results line up with the rows
+    return [
+        result
+        for chunk_results in pool.map(_forecast_chunk, chunks, repeat(n_forecast))
+        for result in chunk_results
+    ]
+
+
+def process_data(input_data: InferenceData, n_workers=None, chunksize=None, estimator=None) -> InferenceData:
+    n_forecast = 7
+    workers = n_workers or default_n_workers
+    size = chunksize or default_chunksize
+    estimator = estimator or default_estimator
+
+    rows = list(input_data["count"])
+    keys = [fit_cache.series_key(row, _order, n_forecast, estimator) for row in rows]
+
+    # only the windows the cache hasn't seen are fitted; the vectorized
+    # estimator already covers the whole batch in one process
+    if estimator == "numpy":
+        def compute(missing):
+            return _forecast_numpy(missing, n_forecast)
+    else:
+        def compute(missing):
+            return _forecast_statsmodels(missing, n_forecast, workers, size)
+    results = fit_cache.cached_map(forecast_cache, rows, keys, compute)
 
     return {
-        "forecast": np.array(forecasts),
-        "weekly_average": np.array(weekly_averages),
+        "forecast": np.array([forecast for forecast, _, _ in results]),
+        "weekly_average": np.array([weekly_average for _, weekly_average, _ in results]),
     }
+
+
+# backtest over a moving window; refit_every warm-starts each window from the
+# previous window's fit, which is faster but not exact (see rolling.py)
+def forecast_rolling(counts, window=28, step=7, refit_every=None):
+    return rolling.rolling_forecasts(_fit_model, counts, window=window, step=step,
+                                     n_forecast=7, refit_every=refit_every)
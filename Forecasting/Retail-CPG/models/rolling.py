@@ -0,0 +1,78 @@
+# Incremental fits for forecasts over a moving window.
+#
+# Backtests slide a one-month window forward a week at a time.  By default
+# every window is fitted from scratch, exactly as the forecast models fit a
+# single window.  With refit_every set, every window is still optimized on its
+# own data: every `refit_every`-th window re-optimizes all the parameters
+# starting from the previous window's, and the windows in between hold the
+# AR and MA coefficients and re-estimate only the mean and noise variance, so
+# the forecasts follow the level of each window.
+#
+# The likelihood of these short ARMA(1, 1) windows is flat near MA = -1, so a
+# warm-started optimization usually stops at a slightly worse optimum than a
+# cold one, and the forecasts drift.  Over the bike rental history
+# (benchmarks/rolling_backtest.py, 101 windows) weekly averages differ from
+# the cold fits' by 93 rentals on average with refit_every=1 (about 1.2x
+# faster) and 106 with refit_every=4 (1.5 to 2x), with log likelihoods 1.8
+# and 2.5 lower per window.  No cheap check tells the worse windows apart (the
+# optimizer converges in all of them), so use warm starts only where speed
+# matters more than matching the cold forecasts.
+
+import numpy as np
+import pandas as pd
+
+
+# fit the window in counts with the AR and MA coefficients of model held
+# fixed, re-estimating the remaining parameters (the mean, if the order has
+# one, and sigma2) starting from model's values
+def _refit_level(model, counts):
+    params = model.params
+    held = {name: params[name] for name in params.index if name.startswith(("ar.", "ma."))}
+    free = params.drop(list(held))
+    return model.model.clone(counts).fit_constrained(held, start_params=free.to_numpy())
+
+
+def rolling_forecasts(fit_model, counts, window=28, step=7, n_forecast=7, refit_every=None):
+    """
+    Forecast n_forecast days past every window of `window` days in counts,
+    moving `step` days at a time.
+
+    fit_model(dataframe, start_params=None) is the forecast module's
+    _fit_model. refit_every=None fits every window from scratch.
+    refit_every=1 warm-starts a full fit for every window; larger values
+    re-estimate only the mean and variance in between, keeping the last AR
+    and MA coefficients. Warm starts trade accuracy for speed, see above.
+
+    Returns the index one past each window's last day with its forecast,
+    weekly average and the log likelihood of the window under the model used.
+    """
+    if refit_every is not None and (int(refit_every) != refit_every or refit_every < 1):
+        raise ValueError(f"refit_every must be None or a positive integer, got {refit_every!r}")
+
+    counts = np.asarray(counts)
+    model = None
+    ends = []
+    forecasts = []
+    loglikes = []
+
+    for i, end in enumerate(range(window, len(counts) + 1, step)):
+        frame = pd.DataFrame({"count": counts[end - window:end]})
+        if model is None or refit_every is None:
+            model = fit_model(frame)
+        elif i % refit_every == 0:
+            model = fit_model(frame, start_params=model.params)
+        else:
+            model = _refit_level(model, frame["count"])
+
+        forecast = model.forecast(steps=n_forecast).round().to_numpy()
+        forecasts.append(forecast.astype(int))
+        ends.append(end)
+        loglikes.append(model.llf)
+
+    forecasts = np.array(forecasts)
+    return {
+        "end": np.array(ends),
+        "forecast": forecasts,
+        "weekly_average": forecasts.mean(axis=1) if len(forecasts) else np.array([]),
+        "llf": np.array(loglikes),
+    }
@@ -1,10 +1,53 @@
+import numpy as np
 import pandas as pd
 
 # takes the JSON output
-# column as `output`
+# column as `output`, or `forecast` as the forecast models name it
+#
+# Every row's forecast is summarized from one 2-D array: its average, min,
+# max and trend (the least-squares slope, in rentals per day) are added as
+# columns, and the summary over the whole batch is returned beside the frame.
+# An empty batch gets the empty columns and a summary with no values.
 def wallaroo_json(data: pd.DataFrame):
-    # Add in code that averages forecast elements
+    if len(data) == 0:
+        empty = np.empty(0, dtype=np.float64)
+        data = data.assign(average_rentals=empty, min_rentals=empty, max_rentals=empty, trend=empty)
+        return [
+                 data,
+                 {
+                   'average_rentals' : None,
+                   'min_rentals' : None,
+                   'max_rentals' : None,
+                   'trend' : None,
+                   'rows' : 0,
+                 }
+               ]
+
+    column = "forecast" if "forecast" in data.columns else "output"
+    forecasts = np.array(data[column].tolist(), dtype=np.float64)
+    if forecasts.ndim != 2:
+        raise ValueError(f"every row of `{column}` must be a forecast of the same length")
+
+    n_days = forecasts.shape[1]
+    days = np.arange(n_days) - (n_days - 1) / 2
+    denominator = (days ** 2).sum()
+
+    average = forecasts.mean(axis=1)
+    trend = forecasts @ days / denominator if denominator > 0 else np.zeros(len(forecasts))
+
+    data = data.assign(
+        average_rentals=average,
+        min_rentals=forecasts.min(axis=1),
+        max_rentals=forecasts.max(axis=1),
+        trend=trend,
+    )
     return [
              data,
-             {'average_rentals' : 1500}
-           ]
\ No newline at end of file
+             {
+               'average_rentals' : float(average.mean()),
+               'min_rentals' : float(forecasts.min()),
+               'max_rentals' : float(forecasts.max()),
+               'trend' : float(trend.mean()),
+               'rows' : len(forecasts),
+             }
+           ]
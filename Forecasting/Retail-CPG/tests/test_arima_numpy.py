@@ -0,0 +1,85 @@
+# Estimates and forecasts of arima_numpy against statsmodels' ARIMA, for
+# every order the forecast models use.
+#
+# usage: python -m pytest tests
+
+import os
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+from statsmodels.tsa.arima.model import ARIMA
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, "..", "models"))
+
+import arima_numpy  # noqa: E402
+
+datafile = os.path.join(here, "..", "Notebooks-with-code", "resources", "bike_rentals.csv")
+
+# order, phi, theta of the simulated process
+processes = [((1, 0, 1), 0.6, 0.3), ((1, 1, 0), 0.5, 0.0), ((0, 1, 1), 0.0, 0.4)]
+
+
+def statsmodels_fit(row, order):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return ARIMA(row, order=order).fit()
+
+
+# n ARMA(1, 1) series of length T around 4000, integrated once for d == 1;
+# long enough that the likelihood has a single clear maximum
+def simulate(order, phi, theta, n=8, T=100, seed=3):
+    rng = np.random.default_rng(seed)
+    shocks = rng.normal(0, 100, (n, T + 50))
+    x = np.zeros_like(shocks)
+    for t in range(1, T + 50):
+        x[:, t] = phi * x[:, t - 1] + shocks[:, t] + theta * shocks[:, t - 1]
+    x = x[:, 50:]
+    return 4000 + (np.cumsum(x, axis=1) if order[1] else x)
+
+
+@pytest.mark.parametrize("order, phi, theta", processes)
+def test_params_match_statsmodels(order, phi, theta):
+    counts = simulate(order, phi, theta)
+
+    params = arima_numpy.fit(counts, order)
+
+    reference = np.stack([statsmodels_fit(row, order).params for row in counts])
+    assert params.shape == reference.shape
+    # [mean,] coefficients..., sigma2
+    if order[1] == 0:
+        np.testing.assert_allclose(params[:, 0], reference[:, 0], rtol=2e-3)
+    np.testing.assert_allclose(params[:, (order[1] == 0):-1], reference[:, (order[1] == 0):-1], atol=1e-3)
+    np.testing.assert_allclose(params[:, -1], reference[:, -1], rtol=2e-2)
+
+
+@pytest.mark.parametrize("order", [order for order, _, _ in processes])
+def test_forecasts_match_statsmodels_on_rentals(order):
+    counts = pd.read_csv(datafile)["cnt"].to_numpy(dtype=np.float64)
+    windows = np.stack([counts[i:i + 28] for i in range(0, len(counts) - 27, 14)])
+
+    forecast, _ = arima_numpy.fit_forecast(windows, order)
+
+    reference = np.stack([statsmodels_fit(row, order).forecast(steps=7) for row in windows])
+    average = forecast.round().mean(axis=1)
+    reference_average = reference.round().mean(axis=1)
+    relative = np.abs(average - reference_average) / np.maximum(np.abs(reference_average), 1.0)
+    # the short windows' likelihoods are flat near MA = -1, so a few windows
+    # may settle on a different, equally likely optimum
+    assert (relative <= 0.02).mean() >= 0.9
+
+
+def test_shared_differences_give_the_same_fit():
+    counts = simulate((1, 1, 0), 0.5, 0.0)
+
+    shared = arima_numpy.fit(counts, (1, 1, 0), differenced=arima_numpy.difference(counts, 1))
+
+    np.testing.assert_array_equal(shared, arima_numpy.fit(counts, (1, 1, 0)))
+
+
+def test_unsupported_order():
+    with pytest.raises(ValueError):
+        arima_numpy.fit(np.zeros((1, 28)), (2, 0, 0))
@@ -0,0 +1,94 @@
+# Lookups, expiry and batching of fit_cache.ForecastCache and cached_map.
+#
+# usage: python -m pytest tests
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "models"))
+
+import fit_cache  # noqa: E402
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_series_key():
+    row = [1, 2, 3]
+
+    assert fit_cache.series_key(row, (1, 0, 1)) == fit_cache.series_key(np.array(row, dtype=float), (1, 0, 1))
+    assert fit_cache.series_key(row, (1, 0, 1)) != fit_cache.series_key(row, (0, 1, 1))
+    assert fit_cache.series_key(row, (1, 0, 1)) != fit_cache.series_key([1, 2, 4], (1, 0, 1))
+
+
+def test_hit_and_miss():
+    cache = fit_cache.ForecastCache(maxsize=2)
+
+    assert cache.get("a") is None
+    cache.put("a", 1)
+    assert cache.get("a") == 1
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_least_recently_used_is_evicted():
+    cache = fit_cache.ForecastCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiry(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(fit_cache.time, "monotonic", clock)
+    cache = fit_cache.ForecastCache(ttl=60)
+    cache.put("a", 1)
+
+    clock.now += 60
+    assert cache.get("a") == 1
+
+    clock.now += 1
+    assert cache.get("a") is None
+    assert len(cache) == 0
+    assert cache.stats()["evictions"] == 1
+
+
+def test_maxsize_zero_disables_caching():
+    cache = fit_cache.ForecastCache(maxsize=0)
+    cache.put("a", 1)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_cached_map_fits_each_missing_key_once():
+    cache = fit_cache.ForecastCache()
+    cache.put("b", "cached b")
+    calls = []
+
+    def compute(rows):
+        calls.append(rows)
+        return [f"fit {row}" for row in rows]
+
+    results = fit_cache.cached_map(cache, ["a", "b", "c", "a"], ["a", "b", "c", "a"], compute)
+
+    assert results == ["fit a", "cached b", "fit c", "fit a"]
+    assert calls == [["a", "c"]]
+    assert fit_cache.cached_map(cache, ["c"], ["c"], compute) == ["fit c"]
+    assert len(calls) == 1
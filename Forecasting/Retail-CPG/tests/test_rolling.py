@@ -0,0 +1,63 @@
+# Moving-window fits of rolling.rolling_forecasts.
+#
+# usage: python -m pytest tests
+
+import os
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+from statsmodels.tsa.arima.model import ARIMA
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "models"))
+
+import rolling  # noqa: E402
+
+window, step = 28, 7
+
+
+def fit_model(dataframe, start_params=None):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return ARIMA(dataframe["count"], order=(1, 0, 1)).fit(start_params=start_params)
+
+
+@pytest.fixture(scope="module")
+def counts():
+    # an AR(1) series whose level jumps half way through
+    rng = np.random.default_rng(7)
+    values = np.empty(70)
+    values[0] = 0.0
+    for i in range(1, len(values)):
+        values[i] = 0.5 * values[i - 1] + rng.normal(scale=50.0)
+    values[35:] += 2000.0
+    return 4000.0 + values
+
+
+def test_default_matches_cold_fits(counts):
+    result = rolling.rolling_forecasts(fit_model, counts, window=window, step=step)
+
+    ends = list(range(window, len(counts) + 1, step))
+    assert result["end"].tolist() == ends
+    for end, forecast in zip(ends, result["forecast"]):
+        model = fit_model(pd.DataFrame({"count": counts[end - window:end]}))
+        np.testing.assert_array_equal(forecast, model.forecast(steps=7).round().to_numpy().astype(int))
+
+
+def test_windows_between_refits_follow_the_level(counts):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        result = rolling.rolling_forecasts(fit_model, counts, window=window, step=step, refit_every=100)
+
+    # only the first window is a full fit; the later windows sit after the
+    # jump and their forecasts move with it
+    assert result["weekly_average"][0] < 4500
+    assert result["weekly_average"][-1] > 5500
+
+
+@pytest.mark.parametrize("refit_every", [0, -1, 1.5])
+def test_refit_every_must_be_positive(counts, refit_every):
+    with pytest.raises(ValueError):
+        rolling.rolling_forecasts(fit_model, counts, refit_every=refit_every)
@@ -0,0 +1,124 @@
+# The persistent sqlite file of simdb.get_db_connection, rebuilt only when
+# the csv changes, and the agreement of the sqlite and columnar backends on
+# the date range queries util builds.
+#
+# usage: python -m pytest tests
+
+import os
+import shutil
+import sys
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+import pytest
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, "..", "Notebooks-with-code"))
+
+from resources import simdb, util  # noqa: E402
+
+datafile = os.path.join(here, "..", "Notebooks-with-code", "resources", "bike_rentals.csv")
+tablename = simdb.tablename
+
+
+@pytest.fixture
+def csv(tmp_path):
+    path = str(tmp_path / "day.csv")
+    shutil.copyfile(datafile, path)
+    return path
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = {"_build": 0, "_file_hash": 0}
+    for name in calls:
+        def counted(*args, _name=name, _function=getattr(simdb, name)):
+            calls[_name] += 1
+            return _function(*args)
+        monkeypatch.setattr(simdb, name, counted)
+    return calls
+
+
+def count_on(conn, day):
+    return conn.execute(f"select cnt from {tablename} where date = ?", (day,)).fetchone()[0]
+
+
+def test_file_is_built_once(csv, tmp_path, calls):
+    dbfile = str(tmp_path / "day.db")
+
+    for _ in range(3):
+        with closing(simdb.get_db_connection(csv, dbfile=dbfile)) as conn:
+            assert count_on(conn, "2011-01-01") == 985
+
+    assert calls["_build"] == 1
+
+
+def test_touched_csv_is_hashed_not_rebuilt(csv, tmp_path, calls):
+    dbfile = str(tmp_path / "day.db")
+    simdb.get_db_connection(csv, dbfile=dbfile).close()
+    built_hashes = calls["_file_hash"]
+
+    mtime = os.stat(csv).st_mtime
+    os.utime(csv, (mtime + 10, mtime + 10))
+    simdb.get_db_connection(csv, dbfile=dbfile).close()
+    simdb.get_db_connection(csv, dbfile=dbfile).close()
+
+    # one hash finds the content unchanged and records the new mtime, so the
+    # next call trusts the mtime again
+    assert calls["_build"] == 1
+    assert calls["_file_hash"] == built_hashes + 1
+
+
+def test_changed_csv_is_rebuilt(csv, tmp_path, calls):
+    dbfile = str(tmp_path / "day.db")
+    simdb.get_db_connection(csv, dbfile=dbfile).close()
+
+    df = pd.read_csv(csv)
+    df.loc[df["dteday"] == "2011-01-01", "cnt"] = 12345
+    mtime = os.stat(csv).st_mtime
+    df.to_csv(csv, index=False)
+    os.utime(csv, (mtime + 10, mtime + 10))
+
+    with closing(simdb.get_db_connection(csv, dbfile=dbfile)) as conn:
+        assert count_on(conn, "2011-01-01") == 12345
+    assert calls["_build"] == 2
+    assert simdb.get_db_connection(csv, backend="columnar").window("2011-01-01")[-1] == 12345
+
+
+@pytest.fixture
+def backends(csv, tmp_path):
+    connections = {
+        "sqlite memory": simdb.get_db_connection(csv),
+        "sqlite file": simdb.get_db_connection(csv, dbfile=str(tmp_path / "day.db")),
+        "columnar": simdb.get_db_connection(csv, backend="columnar"),
+    }
+    yield connections
+    for conn in connections.values():
+        conn.close()
+
+
+forecast_days = ["2011-01-15", "2011-03-01", "2011-03-31", "2012-02-29", "2012-12-31"]
+
+
+def test_backends_agree_on_range_queries(backends):
+    results = {}
+    for name, conn in backends.items():
+        results[name] = [
+            conn.execute(util.mk_dt_range_query(tablename=tablename, forecast_day=day)).fetchall()
+            + conn.execute(util.mk_dt_range_query_params(tablename=tablename), (day, day)).fetchall()
+            for day in forecast_days
+        ]
+
+    assert results["sqlite file"] == results["sqlite memory"]
+    assert results["columnar"] == results["sqlite memory"]
+
+
+def test_backends_agree_on_bulk_windows(backends):
+    results = {name: util.get_dt_ranges(conn, tablename=tablename, forecast_days=forecast_days)
+               for name, conn in backends.items()}
+
+    for name, windows in results.items():
+        assert len(windows) == len(forecast_days)
+        for window, expected in zip(windows, results["sqlite memory"]):
+            np.testing.assert_array_equal(window, expected, err_msg=name)
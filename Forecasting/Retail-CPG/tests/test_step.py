@@ -0,0 +1,37 @@
+# Forecast summaries of step.wallaroo_json.
+#
+# usage: python -m pytest tests
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from step import wallaroo_json  # noqa: E402
+
+
+def test_summaries():
+    data = pd.DataFrame({"forecast": [[1, 2, 3], [6, 4, 2]]})
+
+    frame, summary = wallaroo_json(data)
+
+    np.testing.assert_allclose(frame["average_rentals"], [2.0, 4.0])
+    np.testing.assert_allclose(frame["min_rentals"], [1.0, 2.0])
+    np.testing.assert_allclose(frame["max_rentals"], [3.0, 6.0])
+    np.testing.assert_allclose(frame["trend"], [1.0, -2.0])
+    assert summary == {"average_rentals": 3.0, "min_rentals": 1.0, "max_rentals": 6.0, "trend": -0.5, "rows": 2}
+
+
+def test_empty_batch():
+    data = pd.DataFrame({"forecast": pd.Series([], dtype=object)})
+
+    frame, summary = wallaroo_json(data)
+
+    assert len(frame) == 0
+    for column in ["average_rentals", "min_rentals", "max_rentals", "trend"]:
+        assert column in frame.columns
+        assert frame[column].dtype == np.float64
+    assert summary == {"average_rentals": None, "min_rentals": None, "max_rentals": None, "trend": None, "rows": 0}
@@ -0,0 +1,242 @@
+# Score the house price models locally with onnxruntime, without a Wallaroo
+# cluster, to compare their throughput and latency offline.
+#
+# Sessions are created once per model and thread setting and reused. Input
+# is either the 18 model features (test_data.csv, or a 'tensor' column as in
+# the .df.json files) or raw listings such as seattle_housing.csv, from which
+# the features are derived. CSVs are read and scored batch_size rows at a
+# time, so memory stays bounded however large the file is.
+#
+# usage: python onnx_scoring.py [--csv ../data/seattle_housing.csv] [--models gbr rf xgb]
+#                               [--batch-size 10000] [--intra-op 1 2 4] [--inter-op 1] [--ensemble]
+
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import onnxruntime as ort
+import pandas as pd
+
+models_dir = os.path.dirname(os.path.abspath(__file__))
+
+model_files = {
+    "gbr": "gbr_model.onnx",
+    "rf": "rf_model.onnx",
+    "xgb": "xgb_model.onnx",
+}
+
+# the model input, in order
+feature_columns = [
+    "bedrooms", "bathrooms", "sqft_living", "sqft_lot", "floors", "waterfront", "view",
+    "condition", "grade", "sqft_above", "sqft_basement", "lat", "long", "sqft_living15",
+    "sqft_lot15", "house_age", "renovated", "yrs_since_reno",
+]
+
+# the raw listing columns the derived features come from
+_raw_columns = ["date", "yr_built", "yr_renovated"]
+
+# the models are small tree ensembles: one thread per operator is usually
+# best for small batches, more help large ones. None leaves it to onnxruntime.
+# More than one inter-op thread runs the session in parallel execution mode.
+default_intra_op_threads = None
+default_inter_op_threads = 1
+default_batch_size = 10000
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+# threads for score_ensemble, kept between calls; onnxruntime releases the
+# GIL while a session runs, so the models really do run at the same time
+_executor = None
+_executor_lock = threading.Lock()
+
+
+# the cached session for model name with the given thread settings
+def get_session(name, intra_op_threads=None, inter_op_threads=None):
+    if intra_op_threads is None:
+        intra_op_threads = default_intra_op_threads
+    if inter_op_threads is None:
+        inter_op_threads = default_inter_op_threads
+    key = (name, intra_op_threads, inter_op_threads)
+
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            # inter_op_num_threads only takes effect when independent nodes may run in parallel
+            if inter_op_threads is not None and inter_op_threads > 1:
+                options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+            else:
+                options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+            if intra_op_threads is not None:
+                options.intra_op_num_threads = intra_op_threads
+            if inter_op_threads is not None:
+                options.inter_op_num_threads = inter_op_threads
+            session = ort.InferenceSession(os.path.join(models_dir, model_files[name]), options,
+                                           providers=["CPUExecutionProvider"])
+            _sessions[key] = session
+    return session
+
+
+# the (n, 18) float32 model input for a DataFrame of features, a 'tensor'
+# column of feature rows, or raw listings
+def prepare_features(df):
+    if "tensor" in df.columns:
+        return np.ascontiguousarray(np.stack(df["tensor"].to_numpy()), dtype=np.float32)
+    if all(column in df.columns for column in feature_columns):
+        return df[feature_columns].to_numpy(dtype=np.float32)
+
+    features = np.empty((len(df), len(feature_columns)), dtype=np.float32)
+    raw = feature_columns[:-3]
+    features[:, :len(raw)] = df[raw].to_numpy(dtype=np.float32)
+
+    # sale year from dates like 20141013T000000
+    sale_year = df["date"].astype(str).str[:4].astype(int).to_numpy()
+    yr_built = df["yr_built"].to_numpy()
+    yr_renovated = df["yr_renovated"].to_numpy()
+    renovated = yr_renovated > 0
+    features[:, -3] = sale_year - yr_built
+    features[:, -2] = renovated
+    features[:, -1] = np.where(renovated, yr_renovated - yr_built, 0)
+    return features
+
+
+# predicted prices for an (n, 18) float32 array, run batch_size rows at a time
+def score(name, features, batch_size=None, intra_op_threads=None, inter_op_threads=None):
+    session = get_session(name, intra_op_threads, inter_op_threads)
+    input_name = session.get_inputs()[0].name
+    batch_size = batch_size or default_batch_size
+
+    predictions = np.empty(len(features), dtype=np.float32)
+    for start in range(0, len(features), batch_size):
+        batch = features[start:start + batch_size]
+        predictions[start:start + len(batch)] = session.run(None, {input_name: batch})[0][:, 0]
+    return predictions
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=len(model_files), thread_name_prefix="ensemble")
+    return _executor
+
+
+def _run(session, input_name, value):
+    return session.run_with_ort_values(None, {input_name: value})[0].numpy()[:, 0]
+
+
+# predictions of every model in names for the same (n, 18) array, and their
+# blend, the weighted mean with weights (equal by default). Each batch is
+# wrapped in one OrtValue that all the sessions read, so the input is never
+# copied per model, and the models run concurrently.
+# Returns {name: predictions, ..., "blend": predictions}.
+def score_ensemble(features, names=None, weights=None, batch_size=None,
+                   intra_op_threads=None, inter_op_threads=None):
+    names = list(names or model_files)
+    weights = np.ones(len(names)) if weights is None else np.asarray(weights, dtype=np.float64)
+    if len(weights) != len(names):
+        raise ValueError(f"{len(weights)} weights for {len(names)} models")
+    weights = weights / weights.sum()
+
+    sessions = [get_session(name, intra_op_threads, inter_op_threads) for name in names]
+    input_names = [session.get_inputs()[0].name for session in sessions]
+    features = np.ascontiguousarray(features, dtype=np.float32)
+    batch_size = batch_size or default_batch_size
+    executor = _get_executor()
+
+    predictions = np.empty((len(names), len(features)), dtype=np.float32)
+    for start in range(0, len(features), batch_size):
+        batch = features[start:start + batch_size]
+        value = ort.OrtValue.ortvalue_from_numpy(batch)
+        futures = [executor.submit(_run, session, input_name, value)
+                   for session, input_name in zip(sessions, input_names)]
+        for i, future in enumerate(futures):
+            predictions[i, start:start + len(batch)] = future.result()
+
+    results = dict(zip(names, predictions))
+    results["blend"] = (weights @ predictions).astype(np.float32)
+    return results
+
+
+# the model input of a csv, batch_size rows at a time
+def read_batches(path, batch_size=None):
+    header = pd.read_csv(path, nrows=0).columns
+    if all(column in header for column in feature_columns):
+        usecols = feature_columns
+    else:
+        usecols = feature_columns[:-3] + _raw_columns
+    for chunk in pd.read_csv(path, usecols=usecols, chunksize=batch_size or default_batch_size):
+        yield prepare_features(chunk)
+
+
+# predicted prices for every row of a csv; only one batch of input is in
+# memory at a time
+def score_csv(name, path, batch_size=None, intra_op_threads=None, inter_op_threads=None):
+    predictions = [score(name, features, batch_size, intra_op_threads, inter_op_threads)
+                   for features in read_batches(path, batch_size)]
+    return np.concatenate(predictions) if predictions else np.empty(0, dtype=np.float32)
+
+
+# rows/second over the whole array and per-batch latency percentiles, in
+# milliseconds, after one warm-up batch
+def benchmark(name, features, batch_size, intra_op_threads=None, inter_op_threads=None):
+    session = get_session(name, intra_op_threads, inter_op_threads)
+    input_name = session.get_inputs()[0].name
+    session.run(None, {input_name: features[:batch_size]})
+
+    latencies = []
+    start = time.perf_counter()
+    for offset in range(0, len(features), batch_size):
+        batch_start = time.perf_counter()
+        session.run(None, {input_name: features[offset:offset + batch_size]})
+        latencies.append(time.perf_counter() - batch_start)
+    seconds = time.perf_counter() - start
+
+    latencies = np.array(latencies) * 1000
+    return {
+        "rows_per_second": len(features) / seconds,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="score the house price models locally with onnxruntime")
+    parser.add_argument("--csv", default=os.path.join(models_dir, "..", "data", "seattle_housing.csv"))
+    parser.add_argument("--models", nargs="+", choices=sorted(model_files), default=sorted(model_files))
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[1, 100, default_batch_size])
+    parser.add_argument("--intra-op", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--inter-op", type=int, nargs="+", default=[default_inter_op_threads])
+    parser.add_argument("--ensemble", action="store_true",
+                        help="time score_ensemble against scoring the models one after another")
+    args = parser.parse_args()
+
+    # read once for the sweep; score_csv is the memory-bounded path
+    features = np.concatenate(list(read_batches(args.csv)))
+    print(f"{args.csv}: {len(features)} rows")
+    print(f"{'model':>5} {'batch':>6} {'intra':>5} {'inter':>5} {'rows/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for name in args.models:
+        for batch_size in args.batch_size:
+            for intra_op in sorted(set(args.intra_op)):
+                for inter_op in sorted(set(args.inter_op)):
+                    result = benchmark(name, features, batch_size, intra_op, inter_op)
+                    print(f"{name:>5} {batch_size:>6} {intra_op:>5} {inter_op:>5} "
+                          f"{result['rows_per_second']:>10.0f} {result['p50_ms']:>8.3f} {result['p99_ms']:>8.3f}")
+
+    if args.ensemble:
+        print(f"{'ensemble':>8} {'batch':>6} {'sequential s':>13} {'ensemble s':>11} {'speedup':>8}")
+        for batch_size in args.batch_size:
+            score_ensemble(features[:batch_size], args.models, batch_size=batch_size)
+            start = time.perf_counter()
+            for name in args.models:
+                score(name, features, batch_size)
+            sequential = time.perf_counter() - start
+            start = time.perf_counter()
+            score_ensemble(features, args.models, batch_size=batch_size)
+            together = time.perf_counter() - start
+            print(f"{'':>8} {batch_size:>6} {sequential:>13.3f} {together:>11.3f} {sequential / together:>8.2f}")
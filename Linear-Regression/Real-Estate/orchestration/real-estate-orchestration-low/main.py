@@ -1,6 +1,15 @@
 import wallaroo
 from wallaroo.object import EntityNotFoundError
 import pandas as pd
+import numpy as np
+
+import collections
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import WallarooResolver
+from WallarooResolver import get_resolver
 
 wl = wallaroo.Client()
 
@@ -17,27 +26,125 @@ if "pipeline_name" in arguments:
 else:
     pipeline_name="bikedaypipe"
 
+# the input is read and sent chunk_size records at a time, with at most
+# max_in_flight chunks being inferred at once, and the results are written
+# to output_file as they come back. The input is a records file of 'tensor'
+# rows, or a .csv of the model's features in order, such as
+# ./data/test_data.csv
+if "input_file" in arguments:
+    input_file = arguments['input_file']
+else:
+    input_file = './data/lowprice.df.json'
+
+if "output_file" in arguments:
+    output_file = arguments['output_file']
+else:
+    output_file = './data/results.df.json'
+
+if "chunk_size" in arguments:
+    chunk_size = int(arguments['chunk_size'])
+else:
+    chunk_size = 1000
+
+if "max_in_flight" in arguments:
+    max_in_flight = int(arguments['max_in_flight'])
+else:
+    max_in_flight = 4
+
+# a json file to keep workspace and pipeline ids in between runs
+if "resolver_cache" in arguments:
+    WallarooResolver.default_cache_file = arguments['resolver_cache']
+
 def get_workspace(name):
-    workspace = None
-    for ws in wl.list_workspaces():
-        if ws.name() == name:
-            workspace= ws
-    return workspace
+    return get_resolver(wl).workspace(name)
 
 def get_pipeline(pipeline_name, workspace):
-    plist = workspace.pipelines()
-    pipeline = [p for p in plist if p.name() == pipeline_name]
-    if len(pipeline) <= 0:
+    pipeline = get_resolver(wl).pipeline(pipeline_name, workspace)
+    if pipeline is None:
         raise KeyError(f"Pipeline {pipeline_name} not found in this workspace")
-        return None
-    return pipeline[0]
+    return pipeline
+
+# convert rows start:stop of a feature data frame to the format the model
+# expects in one step: each row of the float32 array becomes one 'tensor'
+# value, as a view rather than a list
+def get_tensors(df, start=0, stop=None):
+    values = df.iloc[start:stop].to_numpy(dtype=np.float32)
+    return pd.DataFrame({'tensor': list(values)})
+
+# read a csv of features chunk_size rows at a time, each chunk converted to
+# the 'tensor' input
+def read_csv_chunks(path, chunk_size):
+    for chunk in pd.read_csv(path, chunksize=chunk_size):
+        yield get_tensors(chunk)
 
-# pull a single datum from a data frame 
-# and convert it to the format the model expects
-def get_singleton(df, i):
-    singleton = df.iloc[i,:].to_numpy().tolist()
-    sdict = {'tensor': [singleton]}
-    return pd.DataFrame.from_dict(sdict)
+_separators = " \t\r\n,"
+
+# read a pandas records file ([{...}, {...}, ...], as written by
+# DataFrame.to_json(orient='records')) a block at a time, yielding
+# DataFrames of up to chunk_size records, so the whole file is never in memory
+def read_chunks(path, chunk_size, block_size=1 << 20):
+    decoder = json.JSONDecoder()
+    records = []
+    with open(path) as f:
+        buffer = f.read(block_size).lstrip()
+        while buffer == "":
+            block = f.read(block_size)
+            if not block:
+                break
+            buffer = block.lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{path} is not a json array of records")
+        pos = 1
+        while True:
+            while pos < len(buffer) and buffer[pos] in _separators:
+                pos += 1
+            if buffer.startswith("]", pos):
+                break
+            try:
+                record, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # the record runs past the end of the buffer
+                block = f.read(block_size)
+                if not block:
+                    raise
+                buffer = buffer[pos:] + block
+                pos = 0
+                continue
+            records.append(record)
+            if len(records) == chunk_size:
+                yield pd.DataFrame.from_records(records)
+                records = []
+    if records:
+        yield pd.DataFrame.from_records(records)
+
+# infer each chunk, with up to max_in_flight requests outstanding, and
+# yield the results in input order
+def infer_chunks(pipeline, chunks, max_in_flight):
+    in_flight = collections.deque()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for chunk in chunks:
+            if len(in_flight) >= max_in_flight:
+                yield in_flight.popleft().result()
+            in_flight.append(executor.submit(pipeline.infer, chunk))
+        while in_flight:
+            yield in_flight.popleft().result()
+
+# write the results to path as one records file, a chunk at a time
+def write_results(results, path):
+    nrows = 0
+    nchunks = 0
+    with open(path, "w") as f:
+        f.write("[")
+        for result in results:
+            nchunks += 1
+            if len(result) == 0:
+                continue
+            if nrows > 0:
+                f.write(",")
+            f.write(result.to_json(orient='records', double_precision=15)[1:-1])
+            nrows += len(result)
+        f.write("]\n")
+    return nrows, nchunks
 
 print(f"Workspace: {workspace_name}")
 workspace = get_workspace(workspace_name)
@@ -52,5 +159,12 @@ print(pipeline)
 
 print(pipeline.status())
 
-inference_result = pipeline.infer_from_file('./data/lowprice.df.json')
-print(inference_result)
+start = time.perf_counter()
+if input_file.endswith(".csv"):
+    chunks = read_csv_chunks(input_file, chunk_size)
+else:
+    chunks = read_chunks(input_file, chunk_size)
+nrows, nchunks = write_results(infer_chunks(pipeline, chunks, max_in_flight), output_file)
+seconds = time.perf_counter() - start
+print(f"Scored {nrows} rows in {nchunks} chunks in {seconds:.1f} seconds ({nrows / seconds:.0f} rows/s)")
+print(f"Results: {output_file}")
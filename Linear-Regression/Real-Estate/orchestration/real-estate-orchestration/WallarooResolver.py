@@ -0,0 +1,197 @@
+# Name to object lookup for workspaces, pipelines and models.
+#
+# Finding a workspace, pipeline or model by name means scanning
+# wl.list_workspaces(), workspace.pipelines() or workspace.models(), which
+# is slow on platforms with many of them. A Resolver scans each list once,
+# keeps a name index in memory, and optionally remembers the ids in a json
+# file for ttl seconds so later runs skip the scan altogether.
+#
+# A name that is not in the index is looked for with one more scan before
+# it is reported missing, so objects created elsewhere are still found.
+# Objects created through the resolver, or passed to its add_ methods, go
+# straight into the index and the file.
+#
+# This module is vendored: an identical copy sits in every directory that
+# uses it (Computer-Vision/Retail, Computer-Vision/Yolov8, Edge-Deployment and
+# each real-estate orchestration).  Each of those is used on its own: the
+# notebooks import their helpers from their own directory, and an
+# orchestration is uploaded as a zip of its directory alone, so there is no
+# shared location they could all import from.  Change every copy together.
+
+import json
+import os
+import time
+import weakref
+
+from wallaroo.object import EntityNotFoundError, RequiredAttributeMissing
+from wallaroo.pipeline import Pipeline
+from wallaroo.workspace import Workspace
+try:
+    from wallaroo.model_version import ModelVersion
+except ImportError:
+    # older SDKs call a model version Model
+    from wallaroo.model import Model as ModelVersion
+
+# set default_cache_file to a path to share the ids between runs
+default_cache_file = None
+default_ttl = 60 * 60
+
+
+class Resolver():
+    def __init__(self, wl, cache_file=None, ttl=None):
+        self.wl = wl
+        self.cache_file = cache_file if cache_file is not None else default_cache_file
+        self.ttl = ttl if ttl is not None else default_ttl
+        # kind -> key -> object; keys are names for workspaces and
+        # (workspace id, name) for pipelines and models
+        self._index = {"workspace": {}, "pipeline": {}, "model": {}}
+        # (workspace id, name) -> model, from the last scan of each workspace;
+        # versions are only fetched for the models asked for
+        self._models = {}
+
+    def workspace(self, name, create=False):
+        workspace = self._lookup("workspace", name, Workspace, self._scan_workspaces)
+        if workspace is None and create:
+            workspace = self.wl.create_workspace(name)
+            self.add_workspace(workspace)
+        return workspace
+
+    # pipelines are created in the client's current workspace, so create
+    # only applies when workspace is the current one
+    def pipeline(self, name, workspace, create=False):
+        key = (workspace.id(), name)
+        pipeline = self._lookup("pipeline", key, Pipeline, lambda: self._scan_pipelines(workspace))
+        if pipeline is None and create:
+            pipeline = self.wl.build_pipeline(name)
+            self.add_pipeline(pipeline, workspace)
+        return pipeline
+
+    # the first version of the model called name, as workspace.models() lists it
+    def model(self, name, workspace):
+        key = (workspace.id(), name)
+        return self._lookup("model", key, ModelVersion, lambda: self._scan_models(workspace, name))
+
+    def add_workspace(self, workspace):
+        self._add("workspace", workspace.name(), workspace)
+
+    def add_pipeline(self, pipeline, workspace):
+        self._add("pipeline", (workspace.id(), pipeline.name()), pipeline)
+
+    def add_model(self, model, workspace):
+        self._add("model", (workspace.id(), model.name()), model)
+
+    # forget everything, or everything of one kind, in memory and on disk
+    def invalidate(self, kind=None):
+        kinds = [kind] if kind is not None else list(self._index)
+        for k in kinds:
+            self._index[k].clear()
+        if "model" in kinds:
+            self._models.clear()
+        if self.cache_file is not None:
+            cache = self._read_cache()
+            entries = cache.get(self._endpoint(), {})
+            for k in kinds:
+                entries.pop(k, None)
+            self._write_cache(cache)
+
+    def _lookup(self, kind, key, cls, scan):
+        obj = self._index[kind].get(key)
+        if obj is None:
+            obj = self._from_cache(kind, key, cls)
+        if obj is None:
+            scan()
+            obj = self._index[kind].get(key)
+        return obj
+
+    def _add(self, kind, key, obj):
+        self._index[kind][key] = obj
+        self._store(kind, {key: obj})
+
+    def _scan_workspaces(self):
+        found = {ws.name(): ws for ws in self.wl.list_workspaces()}
+        self._index["workspace"].update(found)
+        self._store("workspace", found)
+
+    def _scan_pipelines(self, workspace):
+        found = {(workspace.id(), p.name()): p for p in workspace.pipelines()}
+        self._index["pipeline"].update(found)
+        self._store("pipeline", found)
+
+    def _scan_models(self, workspace, name):
+        key = (workspace.id(), name)
+        if key not in self._models:
+            for m in workspace.models():
+                self._models.setdefault((workspace.id(), m.name()), m)
+        if key in self._models:
+            self._add("model", key, self._models[key].versions()[0])
+
+    # the on-disk cache holds ids, per platform, with the time they were seen:
+    # {endpoint: {kind: {key: [id, time]}}}
+    def _endpoint(self):
+        return str(getattr(self.wl, "api_endpoint", ""))
+
+    @staticmethod
+    def _cache_key(key):
+        return key if isinstance(key, str) else f"{key[0]}/{key[1]}"
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    # write to a temporary file and move it into place, so a concurrent
+    # reader never sees a partial file
+    def _write_cache(self, cache):
+        tmpfile = f"{self.cache_file}.{os.getpid()}.tmp"
+        with open(tmpfile, "w") as f:
+            json.dump(cache, f)
+        os.replace(tmpfile, self.cache_file)
+
+    def _store(self, kind, objects):
+        if self.cache_file is None or not objects:
+            return
+        cache = self._read_cache()
+        entries = cache.setdefault(self._endpoint(), {}).setdefault(kind, {})
+        now = time.time()
+        for key, obj in objects.items():
+            entries[self._cache_key(key)] = [obj.id(), now]
+        self._write_cache(cache)
+
+    # an object rebuilt from its cached id, after fetching it confirms it still
+    # exists and has not been renamed.  Only a missing object is a cache miss;
+    # any other error from the platform is raised
+    def _from_cache(self, kind, key, cls):
+        if self.cache_file is None:
+            return None
+        entry = self._read_cache().get(self._endpoint(), {}).get(kind, {}).get(self._cache_key(key))
+        if entry is None or time.time() - entry[1] > self.ttl:
+            return None
+
+        name = key if isinstance(key, str) else key[1]
+        obj = cls(self.wl, {"id": entry[0]})
+        try:
+            # the *_by_pk query the SDK uses returns nothing for a deleted id
+            data = obj._fetch_attributes()
+        except (EntityNotFoundError, RequiredAttributeMissing):
+            return None
+        if data is None:
+            return None
+        obj._fill(data)
+        if obj.name() != name:
+            return None
+        self._index[kind][key] = obj
+        return obj
+
+
+_resolvers = weakref.WeakKeyDictionary()
+
+
+# the shared Resolver for the client wl
+def get_resolver(wl):
+    resolver = _resolvers.get(wl)
+    if resolver is None:
+        resolver = Resolver(wl)
+        _resolvers[wl] = resolver
+    return resolver
@@ -1,6 +1,15 @@
 import wallaroo
 from wallaroo.object import EntityNotFoundError
 import pandas as pd
+import numpy as np
+
+import collections
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import WallarooResolver
+from WallarooResolver import get_resolver
 
 wl = wallaroo.Client()
 
@@ -17,27 +26,191 @@ if "pipeline_name" in arguments:
 else:
     pipeline_name="bikedaypipe"
 
+# the input is read and sent chunk_size records at a time, with at most
+# max_in_flight chunks being inferred at once, and the results are written
+# to output_file as they come back. The input is a records file of 'tensor'
+# rows, or a .csv with the model's feature columns, such as
+# ./data/test_data.csv
+if "input_file" in arguments:
+    input_file = arguments['input_file']
+else:
+    input_file = './data/test_data.df.json'
+
+if "output_file" in arguments:
+    output_file = arguments['output_file']
+else:
+    output_file = './data/results.df.json'
+
+if "chunk_size" in arguments:
+    chunk_size = int(arguments['chunk_size'])
+else:
+    chunk_size = 1000
+
+if "max_in_flight" in arguments:
+    max_in_flight = int(arguments['max_in_flight'])
+else:
+    max_in_flight = 4
+
+# with both high_pipeline_name and low_pipeline_name set, each chunk is
+# split by price band and the two parts scored by their own pipeline
+# instead of pipeline_name: rows whose band_column is at least
+# band_threshold are high. band_column is a feature of the 'tensor' rows,
+# or a field the input records carry beside it, such as a listing price.
+if "high_pipeline_name" in arguments and "low_pipeline_name" in arguments:
+    high_pipeline_name = arguments['high_pipeline_name']
+    low_pipeline_name = arguments['low_pipeline_name']
+else:
+    high_pipeline_name = None
+    low_pipeline_name = None
+
+if "band_column" in arguments:
+    band_column = arguments['band_column']
+else:
+    band_column = "sqft_living"
+
+if "band_threshold" in arguments:
+    band_threshold = float(arguments['band_threshold'])
+else:
+    band_threshold = 4000.0
+
+# a json file to keep workspace and pipeline ids in between runs
+if "resolver_cache" in arguments:
+    WallarooResolver.default_cache_file = arguments['resolver_cache']
+
 def get_workspace(name):
-    workspace = None
-    for ws in wl.list_workspaces():
-        if ws.name() == name:
-            workspace= ws
-    return workspace
+    return get_resolver(wl).workspace(name)
 
 def get_pipeline(pipeline_name, workspace):
-    plist = workspace.pipelines()
-    pipeline = [p for p in plist if p.name() == pipeline_name]
-    if len(pipeline) <= 0:
+    pipeline = get_resolver(wl).pipeline(pipeline_name, workspace)
+    if pipeline is None:
         raise KeyError(f"Pipeline {pipeline_name} not found in this workspace")
-        return None
-    return pipeline[0]
+    return pipeline
+
+# convert rows start:stop of a feature data frame to the format the model
+# expects in one step: each row of the float32 array becomes one 'tensor'
+# value, as a view rather than a list
+def get_tensors(df, start=0, stop=None):
+    values = df.iloc[start:stop].to_numpy(dtype=np.float32)
+    return pd.DataFrame({'tensor': list(values)})
+
+# the features in each 'tensor' row, in order
+feature_columns = [
+    "bedrooms", "bathrooms", "sqft_living", "sqft_lot", "floors", "waterfront", "view",
+    "condition", "grade", "sqft_above", "sqft_basement", "lat", "long", "sqft_living15",
+    "sqft_lot15", "house_age", "renovated", "yrs_since_reno",
+]
+
+# read a csv with the feature columns chunk_size rows at a time, each chunk
+# converted to the 'tensor' input; other columns, such as price, are ignored
+def read_csv_chunks(path, chunk_size):
+    for chunk in pd.read_csv(path, chunksize=chunk_size):
+        yield get_tensors(chunk[feature_columns])
+
+# which rows of a chunk are in the high price band, in one vectorized pass
+def price_band_mask(df, column, threshold):
+    if column in df.columns:
+        values = df[column].to_numpy(dtype=np.float64)
+    else:
+        values = np.stack(df['tensor'].to_numpy())[:, feature_columns.index(column)]
+    return values >= threshold
+
+# Scores chunks like a pipeline, routing each row to the high or low price
+# pipeline: a chunk is split once, both parts are inferred at the same
+# time, and the results are put back in the chunk's row order with a
+# 'band' column saying which pipeline scored each row.
+class PriceBandRouter():
+    def __init__(self, high_pipeline, low_pipeline, column, threshold, max_workers):
+        self.pipelines = {"high": high_pipeline, "low": low_pipeline}
+        self.column = column
+        self.threshold = threshold
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def infer(self, chunk):
+        high = price_band_mask(chunk, self.column, self.threshold)
+        parts = {"high": np.flatnonzero(high), "low": np.flatnonzero(~high)}
+
+        futures = {}
+        for band, rows in parts.items():
+            if len(rows) > 0:
+                part = chunk[['tensor']].iloc[rows].reset_index(drop=True)
+                futures[band] = self.executor.submit(self.pipelines[band].infer, part)
 
-# pull a single datum from a data frame 
-# and convert it to the format the model expects
-def get_singleton(df, i):
-    singleton = df.iloc[i,:].to_numpy().tolist()
-    sdict = {'tensor': [singleton]}
-    return pd.DataFrame.from_dict(sdict)
+        results = [futures[band].result().assign(band=band) for band in futures]
+        combined = pd.concat(results, ignore_index=True)
+        order = np.concatenate([parts[band] for band in futures])
+        return combined.iloc[np.argsort(order)].reset_index(drop=True)
+
+    def close(self):
+        self.executor.shutdown()
+
+_separators = " \t\r\n,"
+
+# read a pandas records file ([{...}, {...}, ...], as written by
+# DataFrame.to_json(orient='records')) a block at a time, yielding
+# DataFrames of up to chunk_size records, so the whole file is never in memory
+def read_chunks(path, chunk_size, block_size=1 << 20):
+    decoder = json.JSONDecoder()
+    records = []
+    with open(path) as f:
+        buffer = f.read(block_size).lstrip()
+        while buffer == "":
+            block = f.read(block_size)
+            if not block:
+                break
+            buffer = block.lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{path} is not a json array of records")
+        pos = 1
+        while True:
+            while pos < len(buffer) and buffer[pos] in _separators:
+                pos += 1
+            if buffer.startswith("]", pos):
+                break
+            try:
+                record, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # the record runs past the end of the buffer
+                block = f.read(block_size)
+                if not block:
+                    raise
+                buffer = buffer[pos:] + block
+                pos = 0
+                continue
+            records.append(record)
+            if len(records) == chunk_size:
+                yield pd.DataFrame.from_records(records)
+                records = []
+    if records:
+        yield pd.DataFrame.from_records(records)
+
+# infer each chunk, with up to max_in_flight requests outstanding, and
+# yield the results in input order
+def infer_chunks(pipeline, chunks, max_in_flight):
+    in_flight = collections.deque()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for chunk in chunks:
+            if len(in_flight) >= max_in_flight:
+                yield in_flight.popleft().result()
+            in_flight.append(executor.submit(pipeline.infer, chunk))
+        while in_flight:
+            yield in_flight.popleft().result()
+
+# write the results to path as one records file, a chunk at a time
+def write_results(results, path):
+    nrows = 0
+    nchunks = 0
+    with open(path, "w") as f:
+        f.write("[")
+        for result in results:
+            nchunks += 1
+            if len(result) == 0:
+                continue
+            if nrows > 0:
+                f.write(",")
+            f.write(result.to_json(orient='records', double_precision=15)[1:-1])
+            nrows += len(result)
+        f.write("]\n")
+    return nrows, nchunks
 
 print(f"Workspace: {workspace_name}")
 workspace = get_workspace(workspace_name)
@@ -45,12 +218,29 @@ workspace = get_workspace(workspace_name)
 wl.set_current_workspace(workspace)
 print(workspace)
 
-# the pipeline is assumed to be deployed
-print(f"Pipeline: {pipeline_name}")
-pipeline = get_pipeline(pipeline_name, workspace)
-print(pipeline)
+# the pipelines are assumed to be deployed
+if high_pipeline_name is not None:
+    print(f"Pipelines: {high_pipeline_name} for {band_column} >= {band_threshold}, {low_pipeline_name} otherwise")
+    high_pipeline = get_pipeline(high_pipeline_name, workspace)
+    low_pipeline = get_pipeline(low_pipeline_name, workspace)
+    print(high_pipeline.status())
+    print(low_pipeline.status())
+    pipeline = PriceBandRouter(high_pipeline, low_pipeline, band_column, band_threshold, 2 * max_in_flight)
+else:
+    print(f"Pipeline: {pipeline_name}")
+    pipeline = get_pipeline(pipeline_name, workspace)
+    print(pipeline)
 
-print(pipeline.status())
+    print(pipeline.status())
 
-inference_result = pipeline.infer_from_file('./data/test_data.df.json')
-print(inference_result)
+start = time.perf_counter()
+if input_file.endswith(".csv"):
+    chunks = read_csv_chunks(input_file, chunk_size)
+else:
+    chunks = read_chunks(input_file, chunk_size)
+nrows, nchunks = write_results(infer_chunks(pipeline, chunks, max_in_flight), output_file)
+seconds = time.perf_counter() - start
+if isinstance(pipeline, PriceBandRouter):
+    pipeline.close()
+print(f"Scored {nrows} rows in {nchunks} chunks in {seconds:.1f} seconds ({nrows / seconds:.0f} rows/s)")
+print(f"Results: {output_file}")
@@ -0,0 +1,75 @@
+# Local scoring of the house price models with models/onnx_scoring.
+#
+# usage: python -m pytest tests
+
+import os
+import sys
+
+import numpy as np
+import onnxruntime as ort
+import pandas as pd
+import pytest
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, "..", "models"))
+
+import onnx_scoring  # noqa: E402
+
+data_dir = os.path.join(here, "..", "data")
+
+
+@pytest.fixture(scope="module")
+def features():
+    return onnx_scoring.prepare_features(pd.read_csv(os.path.join(data_dir, "test_data.csv"), nrows=500))
+
+
+def test_sessions_are_cached_per_thread_setting():
+    session = onnx_scoring.get_session("gbr", 1, 1)
+
+    assert onnx_scoring.get_session("gbr", 1, 1) is session
+    assert onnx_scoring.get_session("gbr", 1, 2) is not session
+
+
+@pytest.mark.parametrize("inter_op, mode", [(1, ort.ExecutionMode.ORT_SEQUENTIAL),
+                                            (2, ort.ExecutionMode.ORT_PARALLEL)])
+def test_execution_mode_follows_inter_op_threads(inter_op, mode):
+    options = onnx_scoring.get_session("rf", 1, inter_op).get_session_options()
+
+    assert options.execution_mode == mode
+    assert options.inter_op_num_threads == inter_op
+
+
+def test_raw_listings_give_the_model_features():
+    listings = pd.read_csv(os.path.join(data_dir, "seattle_housing.csv"), nrows=50)
+
+    features = onnx_scoring.prepare_features(listings)
+
+    assert features.shape == (50, len(onnx_scoring.feature_columns))
+    assert features.dtype == np.float32
+    sale_year = listings["date"].astype(str).str[:4].astype(int)
+    np.testing.assert_array_equal(features[:, -3], sale_year - listings["yr_built"])
+
+
+def test_batches_do_not_change_predictions(features):
+    whole = onnx_scoring.score("xgb", features, batch_size=len(features))
+
+    np.testing.assert_array_equal(onnx_scoring.score("xgb", features, batch_size=64), whole)
+
+
+def test_ensemble_is_the_mean_of_the_models(features):
+    results = onnx_scoring.score_ensemble(features, batch_size=128)
+
+    names = sorted(onnx_scoring.model_files)
+    for name in names:
+        np.testing.assert_array_equal(results[name], onnx_scoring.score(name, features, batch_size=128))
+    expected = np.mean([results[name].astype(np.float64) for name in names], axis=0)
+    np.testing.assert_allclose(results["blend"], expected, rtol=1e-6)
+
+
+def test_weighted_blend(features):
+    results = onnx_scoring.score_ensemble(features, names=["gbr", "rf"], weights=[3, 1])
+
+    expected = 0.75 * results["gbr"].astype(np.float64) + 0.25 * results["rf"].astype(np.float64)
+    np.testing.assert_allclose(results["blend"], expected, rtol=1e-6)
+    with pytest.raises(ValueError):
+        onnx_scoring.score_ensemble(features, names=["gbr", "rf"], weights=[1])